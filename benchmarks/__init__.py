@@ -0,0 +1 @@
+"""Performance benchmarks. Run `python -m benchmarks --help` for usage."""
@@ -0,0 +1,241 @@
+r"""Usage:
+  benchmarks [--help | options]
+
+Time `git-fame` on synthetic repositories, reporting items (files, table rows
+for `tabulate`/`print`, or runs for `startup`) & bytes processed per second,
+and peak RSS. Results may be saved as a baseline, or compared against a
+previously saved one.
+
+Options:
+  -h, --help         Print this help and exit.
+  --files=<n>        Text files per repository [default: 200:int].
+  --lines=<n>        Initial lines per text file [default: 200:int].
+  --authors=<n>      Distinct authors per repository [default: 8:int].
+  --depth=<n>        Commits per repository [default: 100:int].
+  --binary=<n>       Binary files per repository [default: 10:int].
+  --repos=<n>        Repositories for the multi-repo `run()` [default: 3:int].
+  --rows=<n>         Authors (table rows) to `tabulate` [default: 1000:int].
+  --repeat=<n>       Best of how many timings [default: 3:int].
+  --bench=<names>    Comma-separated benchmarks (or prefixes) to run
+                     (default: all). See `--list`.
+  --list             List benchmarks and exit [default: False].
+  --workdir=<d>      Where to generate (& reuse) repositories
+                     (default: a temporary directory).
+  --baseline-dir=<d>  Where to store baselines [default: benchmarks/baselines].
+  --save=<name>      Save results as a named baseline.
+  --compare=<name>   Compare results against a named baseline.
+  --tolerance=<f>    Relative slowdown considered a regression [default: 0.2:float].
+  --in-process       Don't run each benchmark in a fresh process (faster, but
+                     peak RSS is cumulative) [default: False].
+"""
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from functools import partial
+from io import StringIO
+from os import path
+
+from gitfame import __version__, _gitfame, main as gitfame_main
+
+from .synth import make_repo
+
+__all__ = ["main", "BENCHMARKS"]
+log = logging.getLogger(__name__)
+try:
+    import resource
+except ImportError: # pragma: no cover
+    resource = None
+
+
+def peak_rss_mb():
+    """`(self, children)` peak resident set sizes in MiB (`None` if unsupported)"""
+    if resource is None: # pragma: no cover
+        return None, None
+    # bytes on macOS, KiB elsewhere
+    scale = 1 << (20 if sys.platform == "darwin" else 10)
+    return tuple(
+        resource.getrusage(i).ru_maxrss / scale for i in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+
+
+def _tracked_bytes(repo):
+    """Total size of non-binary tracked files"""
+    git_cmd = ["git", "-C", repo]
+    blobs = {}
+    for line in _gitfame.check_output(git_cmd + ["ls-tree", "-r", "-l", "HEAD"]).splitlines():
+        meta, _, fname = line.partition('\t')
+        blobs[fname] = meta.split()[2], int(meta.split()[3])
+    binary = _gitfame._binary_files(git_cmd, list(blobs), blobs)
+    return len(blobs) - len(binary), sum(size for fname, (_, size) in blobs.items() if fname not in binary)
+
+
+def _stats(repo, **kwargs):
+    """Setup for `_get_auth_stats`: returns `(func, files, bytes)`"""
+    kwargs.setdefault("silent_progress", True)
+    files, size = _tracked_bytes(repo)
+    if not kwargs.get("churn", _gitfame.CHURN_SLOC) & _gitfame.CHURN_SLOC:
+        # bytes of `git log` parsed
+        size = len(_gitfame.check_output(["git", "-C", repo, "log", "--format=aN%aN aE%aE ct%ct", "--numstat"]))
+    return partial(_gitfame._get_auth_stats, repo, **kwargs), files, size
+
+
+def _tabulate(rows, backend):
+    """Setup for `tabulate`: returns `(func, rows, bytes)`"""
+    auth_stats = {
+        f"author{i}": {"loc": i * 7 % 1000, "files": set(range(i % 50)), "commits": i % 30 + 1,
+                       "ctimes": set(range(0, 3600 * (i % 9), 600))} for i in range(rows)}
+    stats_tot = {
+        k: sum(_gitfame.int_cast_or_len(s[k]) for s in auth_stats.values()) for k in ("loc", "files", "commits")}
+    func = partial(_gitfame.tabulate, auth_stats, stats_tot, backend=backend, cost={"hours", "months"})
+    return func, rows, len(func())
+
+
+def _print(rows, backend):
+    """Setup for printing (to `os.devnull`) `tabulate`: returns `(func, rows, bytes)`"""
+    tab, rows, size = _tabulate(rows, backend)
+
+    def func():
+        with open(os.devnull, "w", encoding="utf-8") as devnull:
+            _gitfame.print_unicode(_gitfame.iter_tabulate(*tab.args, **tab.keywords), file=devnull)
+
+    return func, rows, size
+
+
+def _run(repos, *args):
+    """Setup for the multi-repo `run()`: returns `(func, files, bytes)`"""
+    tracked = list(map(_tracked_bytes, repos))
+
+    def func():
+        with redirect_stdout(StringIO()):
+            gitfame_main(["-s", "--no-cache", "--format=json", *args, *repos])
+
+    return func, sum(i[0] for i in tracked), sum(i[1] for i in tracked)
+
+
+def _startup(opts, *args):
+    """Setup for a fresh `git-fame` process (on a tiny repo): returns `(func, runs, bytes)`"""
+    repo = make_repo(path.join(opts["workdir"], "startup"), files=1, lines=1, authors=1, depth=1)
+    cmd = [sys.executable, "-m", "gitfame", *args, repo]
+    return partial(subprocess.run, cmd, stdout=subprocess.DEVNULL, check=True), 1, 0
+
+
+def _benchmarks(opts, repos):
+    """`{name: setup}`, where `setup()` returns `(func, files, bytes)`"""
+    res = {
+        "surv": partial(_stats, repos[0], cache_dir=None),
+        "surv-process": partial(_stats, repos[0], cache_dir=None, jobs_mode="process"),
+        "surv-async": partial(_stats, repos[0], cache_dir=None, jobs_mode="async"),
+        "churn": partial(_stats, repos[0], churn=_gitfame.CHURN_INS | _gitfame.CHURN_DEL)}
+    for backend in dict.fromkeys(_gitfame.FORMATS):
+        if backend in ("yaml", "yml"):
+            try:
+                import yaml # NOQA: F401
+            except ImportError:
+                continue
+        res[f"tabulate-{backend}"] = partial(_tabulate, opts["rows"], backend)
+    for backend in ("csv", "md", "svg"):
+        res[f"print-{backend}"] = partial(_print, opts["rows"], backend)
+    res["multi-repo"] = partial(_run, repos)
+    res["multi-repo-churn"] = partial(_run, repos, "--loc=ins,del")
+    res["startup-version"] = partial(_startup, opts, "--version")
+    res["startup-json"] = partial(_startup, opts, "-s", "--no-cache", "--format=json")
+    res["startup-md"] = partial(_startup, opts, "-s", "--no-cache")
+    return res
+
+
+BENCHMARKS = list(_benchmarks({"rows": 0, "workdir": None}, [None]))
+
+
+def _time(opts, name):
+    """Returns `{"seconds": float, ...}` for the best of `opts["repeat"]` runs"""
+    repos = _repos(opts)
+    func, items, size = _benchmarks(opts, repos)[name]()
+    best = float("inf")
+    for _ in range(opts["repeat"]):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    rss, child_rss = peak_rss_mb()
+    return {
+        "seconds": best, "items_per_s": items / best, "bytes_per_s": size / best, "peak_rss_mb": rss,
+        "peak_child_rss_mb": child_rss}
+
+
+def _repos(opts):
+    params = {k: opts[k] for k in ("files", "lines", "authors", "depth", "binary")}
+    key = "-".join(f"{k}{v}" for k, v in params.items())
+    return [make_repo(path.join(opts["workdir"], f"{key}-seed{seed}"), seed=seed, **params)
+            for seed in range(max(opts["repos"], 1))]
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Returns `[(name, old_seconds, new_seconds, is_regression)]`"""
+    return [(name, old["seconds"], results[name]["seconds"],
+             results[name]["seconds"] > old["seconds"] * (1 + tolerance))
+            for name, old in baseline["results"].items() if name in results]
+
+
+def run(opts):
+    """Returns `{"version": str, "params": dict, "results": {name: dict}}`"""
+    names = BENCHMARKS
+    if opts["bench"]:
+        prefixes = opts["bench"].split(',')
+        names = [name for name in names if any(name == i or name.startswith(f"{i}-") for i in prefixes)]
+    # generate once before timing
+    _repos(opts)
+    results = {}
+    ctx = multiprocessing.get_context("spawn")
+    for name in names:
+        log.info("benchmark:%s", name)
+        if opts["in_process"]:
+            results[name] = _time(opts, name)
+        else:
+            with ProcessPoolExecutor(1, mp_context=ctx) as pool:
+                results[name] = pool.submit(_time, opts, name).result()
+    return {
+        "version": __version__, "python": platform.python_version(), "platform": platform.platform(),
+        "params": {k: opts[k] for k in ("files", "lines", "authors", "depth", "binary", "repos", "rows")},
+        "results": results}
+
+
+def main(argv=None):
+    """argv  : list [default: sys.argv[1:]]"""
+    from argopt import argopt
+    from tabulate import tabulate
+    args = argopt(__doc__, prog="python -m benchmarks").parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+    if args.list:
+        print('\n'.join(BENCHMARKS))
+        return 0
+    opts = vars(args)
+    with tempfile.TemporaryDirectory() as tmp:
+        opts["workdir"] = args.workdir or tmp
+        res = run(opts)
+
+    print(tabulate([[name, *r.values()] for name, r in res["results"].items()],
+                   ["benchmark", *next(iter(res["results"].values()), {})], floatfmt=".4g"))
+    if args.save:
+        fname = path.join(args.baseline_dir, f"{args.save}.json")
+        log.info("saving:%s", fname)
+        os.makedirs(args.baseline_dir, exist_ok=True)
+        with open(fname, "w") as fd:
+            json.dump(res, fd, indent=2, sort_keys=True)
+    if args.compare:
+        with open(path.join(args.baseline_dir, f"{args.compare}.json")) as fd:
+            baseline = json.load(fd)
+        if baseline["params"] != res["params"]:
+            log.warning("parameters differ from baseline:%s", baseline["params"])
+        diff = compare(res["results"], baseline, args.tolerance)
+        print(tabulate([[name, old, new, new / old, "REGRESSION" if bad else ""] for name, old, new, bad in diff],
+                       ["benchmark", f"{baseline['version']} (s)", f"{res['version']} (s)", "ratio", ""],
+                       floatfmt=".4g"))
+        if any(bad for *_, bad in diff):
+            return 1
+    return 0
@@ -0,0 +1,77 @@
+"""Reproducible synthetic `git` repository generator"""
+import random
+import subprocess
+from os import path
+
+__all__ = ["make_repo"]
+# first commit time
+EPOCH = 1600000000
+
+
+def _blob(content):
+    return b"data %d\n%s\n" % (len(content), content)
+
+
+def _fast_import_stream(files=100, lines=100, authors=5, depth=20, binary=0, seed=0):
+    """Yields `git fast-import` commands (bytes) for a random history"""
+    rng = random.Random(seed)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "iota", "kappa"]
+    exts = ["py", "c", "md", "txt", "js", "rst"]
+    names = [f"dir{i % 7}/sub{i % 3}/file{i}.{exts[i % len(exts)]}" for i in range(files)]
+    bins = [f"assets/blob{i}.bin" for i in range(binary)]
+    contents = {fname: [f"{rng.choice(words)} {rng.getrandbits(32):08x} {i}" for i in range(lines)]
+                for fname in names}
+    tstamp = EPOCH
+    for n in range(max(depth, 1)):
+        auth = rng.randrange(authors)
+        # mostly-short gaps (for `--cost=hours`) with occasional long breaks
+        tstamp += rng.choice((60, 600, 1800, 3600, 86400))
+        ident = b"author%d <author%d@example.com> %d +0000" % (auth, auth, tstamp)
+        yield b"commit refs/heads/master\nmark :%d\nauthor %s\ncommitter %s\n" % (n + 1, ident, ident)
+        yield _blob(b"commit %d" % n)
+        if n == 0:
+            changed, changed_bins = names, bins
+        else:
+            changed = rng.sample(names, max(1, files // 10)) if files else []
+            changed_bins = [i for i in bins if rng.random() < 0.1]
+            for fname in changed:
+                content = contents[fname]
+                for _ in range(max(1, len(content) // 10)):
+                    op, i = rng.random(), rng.randrange(len(content) + 1)
+                    if op < 0.5 and i < len(content):
+                        content[i] = f"{rng.choice(words)} {rng.getrandbits(32):08x} c{n}"
+                    elif op < 0.8 or not content:
+                        content.insert(i, f"{rng.choice(words)} {rng.getrandbits(32):08x} c{n}")
+                    elif i < len(content):
+                        content.pop(i)
+        for fname in changed:
+            yield b"M 100644 inline " + fname.encode('U8') + b"\n" + _blob('\n'.join(contents[fname]).encode('U8'))
+        for fname in changed_bins:
+            content = b"\0" + rng.getrandbits(8192).to_bytes(1024, "little")
+            yield b"M 100644 inline " + fname.encode('U8') + b"\n" + _blob(content)
+        yield b"\n"
+
+
+def make_repo(repo, files=100, lines=100, authors=5, depth=20, binary=0, seed=0):
+    """
+    Create (or reuse, if already present) a synthetic `git` repository.
+
+    files  : int, number of text files.
+    lines  : int, initial lines per text file.
+    authors  : int, number of distinct authors.
+    depth  : int, number of commits.
+    binary  : int, number of binary files.
+    seed  : int, random seed (same parameters & seed produce identical repos).
+    """
+    if path.isdir(path.join(repo, ".git")):
+        return repo
+    subprocess.check_call(["git", "init", "-q", repo])
+    subprocess.check_call(["git", "-C", repo, "symbolic-ref", "HEAD", "refs/heads/master"])
+    with subprocess.Popen(["git", "-C", repo, "fast-import", "--quiet"], stdin=subprocess.PIPE) as proc:
+        for cmd in _fast_import_stream(files, lines, authors, depth, binary, seed):
+            proc.stdin.write(cmd)
+        proc.stdin.close()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, proc.args)
+    subprocess.check_call(["git", "-C", repo, "reset", "-q", "--hard"])
+    return repo
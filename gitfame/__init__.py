@@ -1,3 +1,16 @@
-from ._gitfame import __author__, __copyright__, __date__, __licence__, __license__, __version__, main
+from ._gitfame import __author__, __copyright__, __date__, __licence__, __license__, get_auth_stats, main
 
-__all__ = ['main', '__author__', '__date__', '__licence__', '__copyright__', '__version__', '__license__']
+__all__ = [
+    'main', 'fame', 'iter_files', 'FameResult', 'AuthorStats', 'FileStats', 'get_auth_stats', '__author__', '__date__',
+    '__licence__', '__copyright__', '__version__', '__license__']
+# imported upon first use (for faster command-line startup)
+_LAZY = {
+    'fame': '_api', 'iter_files': '_api', 'FameResult': '_api', 'AuthorStats': '_api', 'FileStats': '_api',
+    '__version__': '_gitfame'}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        from importlib import import_module
+        return getattr(import_module(f".{_LAZY[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
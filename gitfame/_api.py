@@ -0,0 +1,168 @@
+"""Public, typed Python API (no command-line parsing or table rendering)"""
+import logging
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Union
+
+from ._gitfame import _churn_type, _fame, _file_filters, hours
+from ._sched import Scheduler
+
+__author__ = "Casper da Costa-Luis <casper.dcl@physics.org>"
+__date__ = "2016-2026"
+__licence__ = "[MPLv2.0](https://mozilla.org/MPL/2.0/)"
+__all__ = ["AuthorStats", "FileStats", "FameResult", "fame", "iter_files"]
+__copyright__ = ' '.join(("Copyright (c)", __date__, __author__, __licence__))
+__license__ = __licence__ # weird foreign language
+
+log = logging.getLogger(__name__)
+Filter = Union[str, Iterable[str], None]
+
+
+@dataclass(frozen=True)
+class AuthorStats:
+    """Statistics for one author (as identified by `show`)"""
+    author: str
+    loc: int = 0
+    commits: int = 0
+    files: FrozenSet[str] = frozenset()
+    ctimes: FrozenSet[int] = frozenset()
+    # `{".<extension>": loc}` (only if `bytype`)
+    bytype: Dict[str, int] = field(default_factory=dict)
+    # `{"<directory>": loc}` (only if `by_dir`)
+    bydir: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def hours(self) -> float:
+        """Estimated person-hours (based on commit times)"""
+        return hours(self.ctimes)
+
+    @property
+    def months(self) -> float:
+        """Estimated person-months (COCOMO, based on `loc`)"""
+        return 3.2 * (self.loc / 1e3)**1.05
+
+
+@dataclass(frozen=True)
+class FileStats:
+    """Statistics for one file"""
+    repo: str
+    path: str
+    # `{"<name> <<email>>": loc}`
+    authors: Dict[str, int]
+
+    @property
+    def loc(self) -> int:
+        return sum(self.authors.values())
+
+
+@dataclass(frozen=True)
+class FameResult:
+    """Per-author (and per-file, if requested) statistics"""
+    authors: Dict[str, AuthorStats]
+    # `{"loc": int, "files": int, "commits": int, "ctimes": int, ...}`
+    totals: Dict[str, int]
+    files: List[FileStats] = field(default_factory=list)
+
+    def sorted(self, key: str = "loc", reverse: bool = True) -> List[AuthorStats]:
+        """Authors sorted by `key` (loc|commits|files|hours|months)"""
+        def value(stats):
+            val = getattr(stats, key)
+            return len(val) if key == "files" else val
+
+        return sorted(self.authors.values(), key=value, reverse=reverse)
+
+
+def _options(include: Filter = None, exclude: Filter = None, regex: bool = True, loc: Union[str, None] = None,
+             cost: Union[str, None] = None, show: str = "name", progress: bool = False, **kwargs):
+    """Convert `fame` keyword arguments to `_get_auth_stats` ones"""
+    # `str`s as per `regex`, other iterables as exact paths (each independently)
+    include_files, exclude_files = _file_filters(
+        include if isinstance(include, str) and include else ".*",
+        exclude if isinstance(exclude, str) else "", not regex)
+    if include is not None and not isinstance(include, str):
+        include_files = set(include)
+    if exclude is not None and not isinstance(exclude, str):
+        exclude_files = set(exclude)
+    kwargs["include_files"], kwargs["exclude_files"] = include_files, exclude_files
+    kwargs["churn"] = _churn_type(loc, set(cost.lower().split(',')) if cost else None)
+    kwargs["show"] = set(show.lower().split(','))
+    kwargs["silent_progress"] = not progress
+    return kwargs
+
+
+def fame(*gitdirs: str, branch: str = "HEAD", since: Optional[str] = None, until: Optional[str] = None,
+         include: Filter = None, exclude: Filter = None, regex: bool = True, loc: Optional[str] = None,
+         cost: Optional[str] = None, show: str = "name", bytype: bool = False, by_dir: int = 0,
+         ignore_whitespace: bool = False, M: bool = False, C: bool = False, ignore_rev: str = "",
+         ignore_revs_file: Optional[str] = None,
+         warn_binary: bool = False, jobs: Optional[int] = None, jobs_mode: str = "thread",
+         cache_dir: Optional[str] = None, incremental: bool = False, progress: bool = False, per_file: bool = False,
+         on_file: Optional[Callable[[FileStats], None]] = None,
+         cancel: Optional[threading.Event] = None) -> FameResult:
+    """
+    Returns statistics for the given `gitdirs` [default: "."]. Options mirror
+    the command-line ones, except:
+
+    include, exclude  : str (regex, or comma-separated if not `regex`),
+      or an iterable of exact paths.
+    cost  : only affects the default `loc`.
+    cache_dir  : on-disk cache location [default: None (disabled)].
+    per_file  : whether to also populate `FameResult.files`.
+    on_file  : called with each `FileStats` as soon as it is available.
+    cancel  : stop processing (raising `concurrent.futures.CancelledError`) once set.
+    """
+    gitdirs = list(dict.fromkeys(gitdirs or ["."]))
+    files = []
+
+    def file_done(gitdir, fname, tally):
+        res = FileStats(gitdir, fname, {auth: stats["loc"] for auth, stats in tally.items()})
+        if per_file:
+            files.append(res)
+        if on_file is not None:
+            on_file(res)
+
+    kwargs = _options(
+        include=include, exclude=exclude, regex=regex, loc=loc, cost=cost, show=show, progress=progress,
+        branch=branch, since=since, until=until, bytype=bytype, by_dir=by_dir, ignore_whitespace=ignore_whitespace,
+        M=M, C=C, ignore_rev=ignore_rev, ignore_revs_file=ignore_revs_file, warn_binary=warn_binary,
+        cache_dir=cache_dir, incremental=incremental, cancel=cancel,
+        on_file=file_done if (per_file or on_file) else None)
+    with Scheduler(jobs, jobs_mode) as scheduler:
+        auth_stats, totals = _fame(gitdirs, scheduler, **kwargs)
+    return FameResult(
+        {
+            auth: AuthorStats(auth, loc=stats.get("loc", 0), commits=stats.get("commits", 0),
+                              files=frozenset(stats["files"]), ctimes=frozenset(stats["ctimes"]),
+                              bytype=dict(stats.get("bytype", {})), bydir=dict(stats.get("bydir", {})))
+            for auth, stats in auth_stats.items()}, totals, files)
+
+
+def iter_files(*gitdirs: str, **kwargs) -> Iterator[FileStats]:
+    """
+    Yields `FileStats` (as per `fame(*gitdirs, **kwargs)`) as soon as each
+    file is processed. Closing the iterator early cancels remaining work.
+    """
+    kwargs.pop("per_file", None)
+    cancel = kwargs.setdefault("cancel", threading.Event())
+    results = queue.Queue()
+    done = object()
+
+    def target():
+        try:
+            fame(*gitdirs, on_file=results.put, **kwargs)
+        except BaseException as exc:
+            results.put(exc)
+        else:
+            results.put(done)
+
+    thread = threading.Thread(target=target, name="gitfame-iter_files", daemon=True)
+    thread.start()
+    try:
+        while (res := results.get()) is not done:
+            if isinstance(res, BaseException):
+                raise res
+            yield res
+    finally:
+        cancel.set()
+        thread.join()
@@ -0,0 +1,194 @@
+"""Persistent on-disk cache of per-file `git blame` tallies & previous runs"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from os import path
+
+__author__ = "Casper da Costa-Luis <casper.dcl@physics.org>"
+__date__ = "2016-2026"
+__licence__ = "[MPLv2.0](https://mozilla.org/MPL/2.0/)"
+__all__ = ["BlameCache", "Checkpoint", "default_cache_dir"]
+__copyright__ = ' '.join(("Copyright (c)", __date__, __author__, __licence__))
+__license__ = __licence__ # weird foreign language
+
+log = logging.getLogger(__name__)
+# bump whenever the stored tally (or table) format changes
+SCHEMA = 2
+# least recently used entries beyond this are evicted
+MAX_ENTRIES = 1_000_000
+
+
+def default_cache_dir():
+    """`$XDG_CACHE_HOME/git-fame` (falls back to `~/.cache/git-fame`)"""
+    return path.join(os.environ.get('XDG_CACHE_HOME') or path.join(path.expanduser('~'), '.cache'), 'git-fame')
+
+
+class BlameCache:
+    """
+    SQLite store of `{path: {"<author>": {"loc": int, "ctimes": {int}}}}` tallies.
+
+    Entries are keyed by `(repo, opts, path)`, where `opts` is a digest of all
+    options affecting blame output. Each entry also records the `commit` it was
+    last known to be valid at. Callers are responsible for checking that `path`
+    was not touched between `commit` and the current branch tip.
+
+    The (JSON) `state` of the last `--incremental` run per `(repo, opts, branch)`,
+    and whether or not each blob `sha` is binary, are also stored.
+    """
+    def __init__(self, cache_dir, max_entries=MAX_ENTRIES):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.max_entries = max_entries
+        import sqlite3
+        self.db = sqlite3.connect(path.join(cache_dir, f"blame-v{SCHEMA}.sqlite3"), timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS blames (repo TEXT, opts TEXT, path TEXT, commit_sha TEXT,"
+                        " tally TEXT, atime REAL, PRIMARY KEY (repo, opts, path))")
+        self.db.execute("CREATE INDEX IF NOT EXISTS blames_atime ON blames (atime)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS blobs (sha TEXT PRIMARY KEY, binary INTEGER, atime REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS blobs_atime ON blobs (atime)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS runs (repo TEXT, opts TEXT, branch TEXT, commit_sha TEXT,"
+                        " state TEXT, PRIMARY KEY (repo, opts, branch))")
+        self.db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def _select_in(self, query, args, values):
+        """Run `query` with `IN ({values})` appended, in chunks"""
+        values = list(values)
+        for i in range(0, len(values), 500): # stay below SQLITE_MAX_VARIABLE_NUMBER
+            chunk = values[i:i + 500]
+            yield from self.db.execute(f"{query} IN ({','.join('?' * len(chunk))})", args + chunk)
+
+    def lookup(self, repo, opts, paths):
+        """Returns `{path: (commit, tally)}` for all cached `paths`"""
+        return {
+            fname: (commit, json.loads(tally))
+            for fname, commit, tally in self._select_in(
+                "SELECT path, commit_sha, tally FROM blames WHERE repo = ? AND opts = ? AND path", [repo, opts],
+                paths)}
+
+    def lookup_blobs(self, shas):
+        """Returns `{sha: is_binary}` for all cached `shas` (marking them as recently used)"""
+        res = {
+            sha: bool(binary)
+            for sha, binary in self._select_in("SELECT sha, binary FROM blobs WHERE sha", [], shas)}
+        if res:
+            now = time.time()
+            with self.db:
+                self.db.executemany("UPDATE blobs SET atime = ? WHERE sha = ?", ((now, sha) for sha in res))
+        return res
+
+    def store_blobs(self, binary):
+        """Save `{sha: is_binary}`, evicting old entries as needed"""
+        now = time.time()
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?)",
+                                ((sha, is_binary, now) for sha, is_binary in binary.items()))
+            self._evict("blobs")
+
+    def _evict(self, table):
+        """Delete least recently used entries of `table` beyond `max_entries`"""
+        if (excess := self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] - self.max_entries) > 0:
+            log.debug("evicting %d %s", excess, table)
+            self.db.execute(f"DELETE FROM {table} WHERE rowid IN"
+                            f" (SELECT rowid FROM {table} ORDER BY atime LIMIT ?)", (excess,))
+
+    def touch(self, repo, opts, paths, commit):
+        """Mark cached `paths` as still valid at `commit`"""
+        now = time.time()
+        with self.db:
+            self.db.executemany(
+                "UPDATE blames SET commit_sha = ?, atime = ? WHERE repo = ? AND opts = ? AND path = ?",
+                ((commit, now, repo, opts, fname) for fname in paths))
+
+    def store(self, repo, opts, tallies, commit):
+        """Save `{path: tally}` computed at `commit`, evicting old entries as needed"""
+        now = time.time()
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO blames VALUES (?, ?, ?, ?, ?, ?)",
+                                ((repo, opts, fname, commit, json.dumps(tally, default=sorted), now)
+                                 for fname, tally in tallies.items()))
+            self._evict("blames")
+
+    def last_run(self, repo, opts, branch):
+        """Returns `(commit, state)` of the last saved run, or `None`"""
+        res = self.db.execute("SELECT commit_sha, state FROM runs WHERE repo = ? AND opts = ? AND branch = ?",
+                              (repo, opts, branch)).fetchone()
+        return (res[0], json.loads(res[1])) if res else None
+
+    def save_run(self, repo, opts, branch, commit, state):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?)",
+                            (repo, opts, branch, commit, json.dumps(state, default=sorted)))
+
+
+class Checkpoint:
+    """
+    Append-only journal (JSON lines) of per-file `git blame` tallies, keyed by
+    `(repo, opts, commit)` as per `BlameCache`, so that interrupted runs may
+    be resumed. Each tally is written (& flushed) as soon as it is `append`ed.
+    Incomplete (e.g. killed mid-write) lines are ignored.
+    """
+    def __init__(self, fname):
+        self.fname = fname
+        self._entries = None # `{(repo, opts, commit): {path: tally}}`, read once
+        self._fd = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                self._fd.close()
+                self._fd = None
+
+    def _read(self):
+        entries = defaultdict(dict)
+        try:
+            with open(self.fname, 'rb') as fd:
+                for line in fd:
+                    try:
+                        rec = json.loads(line)
+                        entries[rec["repo"], rec["opts"], rec["commit"]][rec["path"]] = rec["tally"]
+                    except (ValueError, KeyError, TypeError):
+                        log.debug("skipping incomplete checkpoint entry:%r", line[:64])
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def lookup(self, repo, opts, commit, paths):
+        """Returns `{path: tally}` for all journalled `paths`"""
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._read()
+            entries = self._entries.get((repo, opts, commit), {})
+        return {fname: entries[fname] for fname in paths if fname in entries}
+
+    def append(self, repo, opts, commit, fname, tally):
+        """Journal `tally` of `fname` computed at `commit`"""
+        line = json.dumps({"repo": repo, "opts": opts, "commit": commit, "path": fname, "tally": tally},
+                          default=sorted).encode('utf-8') + b'\n'
+        with self._lock:
+            if self._fd is None:
+                self._fd = open(self.fname, 'a+b')
+                if self._fd.seek(0, os.SEEK_END): # terminate any incomplete last line
+                    self._fd.seek(-1, os.SEEK_END)
+                    if self._fd.read(1) != b'\n':
+                        self._fd.write(b'\n')
+            self._fd.write(line)
+            self._fd.flush()
@@ -34,15 +34,30 @@ Options:
                   rather than regular expressions [default: False].
                   NB: if regex is enabled ',' is equivalent to '|'.
   -s, --silent-progress    Suppress `tqdm` [default: False].
-  -j=<n>, --jobs=<n>  Number of concurrent `git blame` threads per <gitfir>
-                      [default: 0:int]: automatic.
+  --shard=<i/n>  Only process the <i>th of <n> size-balanced partitions of
+                 the (filtered) files of each <gitdir> (eg: 2/4), counting
+                 commits in the 1st partition only. Use `--format=partial`
+                 & combine the results with `git-fame merge`.
+  -j=<n>, --jobs=<n>  Number of concurrent `git` jobs (across all
+                      <gitdir>s) [default: 0:int]: automatic (adapting to
+                      the observed throughput & memory use at runtime).
+  --max-jobs=<n>  Maximum automatic `--jobs` [default: 0:int]: depends on
+                  `--jobs-mode`.
+  --max-memory=<size>  Limit automatic `--jobs` such that concurrent `git`
+                       processes should use at most <size> (eg: 4G) memory.
+  --jobs-mode=<m>  [default: thread]|process|async. `process` also
+                   parallelises parsing of `git blame` output, while `async`
+                   runs many more (default 256) concurrent jobs on an
+                   `asyncio` event loop.
   --warn-binary  Don't silently skip files which appear to be binary data
                  [default: False].
   --show=<info>  Author information to show [default: name]|email.
                  Use 'name,email' to show both.
   -e, --show-email  Shortcut for `--show=email`.
   --enum         Show row numbers [default: False].
-  -t, --bytype             Show stats per file extension [default: False].
+  -t, --bytype             Show loc per file extension [default: False].
+  --by-dir=<n>   Show loc per directory, truncated to its first <n>
+                 components [default: 0:int] (eg: 1 for top-level ones).
   -w, --ignore-whitespace  Ignore whitespace when comparing the parent's
                            version and the child's to find where the lines
                            came from [default: False].
@@ -52,52 +67,81 @@ Options:
                            (requires `--loc=surviving`).
   --ignore-revs-file=<f>   Ignore revisions listed in the given file
                            (requires `--loc=surviving`).
+  --no-cache     Don't read or write the on-disk `git blame` cache
+                 [default: False].
+  --cache-dir=<d>  Cache directory (default: $XDG_CACHE_HOME/git-fame).
+  --incremental  Reuse the previous run's (cached) results, only re-processing
+                 files & commits changed since [default: False].
+  --checkpoint=<f>  Append each file's `git blame` results to the journal <f>
+                    as soon as they are available, skipping files already
+                    in <f> (for the same commit & options), so that
+                    interrupted runs may be resumed.
+  --timeline=<spec>  Show the `--sort` key per author at multiple points in
+                     time: <n> evenly spaced, every <interval> (eg: 1.month)
+                     back from the latest commit, or at the commits of a
+                     rev-list (eg: '--tags', evaluated in the first <gitdir>;
+                     others are sampled at those commits' times). `--since`
+                     & `--until` restrict the range sampled (requires
+                     `--loc=surviving`).
+  --profile=<f>  Save per-phase & per-file timings to <f> (Chrome trace
+                 JSON, also including a summary of phases, slowest files,
+                 and worker utilisation).
   --format=<format>        Table format
-      fame|svg|[default: md]|yaml|json|csv|tsv.
+      fame|svg|[default: md]|yaml|json|jsonl|csv|tsv.
       Any `tabulate.tabulate_formats` is also accepted.
       Most formats can also be prefixex by `svg-`, e.g. `svg-fame`.
+      `jsonl` streams one line per (repo, file, author) as soon as each
+      file is processed, followed by a final `json` line.
+      `partial` outputs raw stats to combine with `git-fame merge`.
   --log=<lvl>    FATAL|CRITICAL|ERROR|WARN(ING)|[default: INFO]|DEBUG|NOTSET.
 """
+import hashlib
+import heapq
+import json
 import logging
 import os
 import re
 import subprocess
+import sys
+import threading
 from collections import defaultdict
-from functools import partial
-from importlib.metadata import PackageNotFoundError, version
+from collections.abc import Sequence, Set
+from concurrent.futures import CancelledError, Future, InvalidStateError, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache, partial
 from os import path
 
-import tabulate as tabber
-
-from ._utils import (TERM_WIDTH, Str, TqdmStream, check_output, fext, int_cast_or_len, mapper, merge_stats,
-                     print_unicode, tqdm)
+from ._cache import SCHEMA, BlameCache, Checkpoint, default_cache_dir
+from ._profile import Profiler, metered, span
+from ._sched import Scheduler
+from ._utils import (TERM_WIDTH, FileSet, PathTable, Str, TqdmStream, check_output, fdir, fext, int_cast_or_len,
+                     iter_output, merge_stats, print_unicode, tqdm)
 
-# version detector. Precedence: installed dist, git, 'UNKNOWN'
-try:
-    __version__ = version('git-fame')
-except PackageNotFoundError:
-    __version__ = "UNKNOWN"
 __author__ = "Casper da Costa-Luis <casper.dcl@physics.org>"
 __date__ = "2016-2026"
 __licence__ = "[MPLv2.0](https://mozilla.org/MPL/2.0/)"
-__all__ = ["main"]
+__all__ = ["main", "get_auth_stats"]
 __copyright__ = ' '.join(("Copyright (c)", __date__, __author__, __licence__))
 __license__ = __licence__ # weird foreign language
 log = logging.getLogger(__name__)
 
-# processing `blame --line-porcelain`
-RE_AUTHS_BLAME = re.compile(r'^\w+ \d+ \d+ (\d+)\nauthor (.+?)\nauthor-mail <(.*?)>$.*?\ncommitter-time (\d+)',
-                            flags=re.M | re.DOTALL)
 RE_NCOM_AUTH_EM = re.compile(r'^\s*(\d+)\s+(.*?)\s+<(.*)>\s*$', flags=re.M)
-RE_BLAME_BOUNDS = re.compile(r'^\w+\s+\d+\s+\d+(\s+\d+)?\s*$[^\t]*?^boundary\s*$[^\t]*?^\t.*?$\r?\n',
-                             flags=re.M | re.DOTALL)
 # processing `log --format="aN%aN aE%aE ct%ct" --numstat`
-RE_AUTHS_LOG = re.compile(r"^aN(.+?) aE(.*?) ct(\d+)\n\n", flags=re.M)
-RE_STAT_BINARY = re.compile(r"^\s*?-\s*-.*?\n", flags=re.M)
-RE_RENAME = re.compile(r"\{.+? => (.+?)\}")
+RE_AUTH_LOG = re.compile(r"^aN(.+?) aE(.*?) ct(\d+)$")
+# `{old => new}` (either may be empty) or `old => new`
+RE_RENAME = re.compile(r"\{(.*?) => (.*?)\}")
 # finds all non-escaped commas
 # NB: does not support escaping of escaped character
 RE_CSPILT = re.compile(r'(?<!\\),')
+# same as `git grep -I`
+BINARY_CHECK_BYTES = 8000
+# files larger than this many bytes are blamed in `-L` line ranges (of about
+# this size each) in parallel
+BLAME_SPLIT_BYTES = 1 << 20
+# `--jobs-mode=process` blames files smaller than this many bytes in batches
+# (of at most this many bytes & `PROCESS_BATCH_FILES` files) per task
+PROCESS_BATCH_BYTES = 1 << 16
+PROCESS_BATCH_FILES = 16
 # options
 COST_MONTHS = {'cocomo', 'month', 'months'}
 COST_HOURS = {'commit', 'commits', 'hour', 'hours'}
@@ -106,21 +150,70 @@ CHURN_INS = {'ins', 'insert', 'insertion', 'insertions', 'add', 'addition', 'add
 CHURN_DEL = {'del', 'deletion', 'deletions', 'delete', '-'}
 SHOW_NAME = {'name', 'n'}
 SHOW_EMAIL = {'email', 'e'}
-FORMATS = ['yaml', 'yml', 'json', 'csv', 'tsv']
-FORMATS.extend(['svg', 'md', 'markdown', 'tabulate'])
-tabber._table_formats['fame'] = tabber.TableFormat(lineabove=None, linebelowheader=tabber.Line("", "─", "┼", ""),
-                                                   linebetweenrows=None, linebelow=tabber.Line("", "─", "┴", ""),
-                                                   headerrow=tabber.DataRow("", "│",
-                                                                            ""), datarow=tabber.DataRow("", "│", ""),
-                                                   padding=1, with_header_hide=None)
-FORMATS.extend(tabber._table_formats)
-FORMATS.extend(f"svg-{i}" for i in tabber._table_formats
-               if not re.search("asciidoc|html|jira|latex|mediawiki|moinmoin|textile|tsv|youtrack", i))
+# `{kind: name}` of per-author `{group: loc}` stats (as per `_file_groups`)
+GROUPS = {'bytype': 'type', 'bydir': 'directory'}
+# formats which don't require `tabulate`
+FORMATS_BUILTIN = [
+    'yaml', 'yml', 'json', 'jsonl', 'csv', 'tsv', 'partial', 'svg', 'md', 'markdown', 'tabulate', 'fame']
+
+
+@lru_cache(maxsize=None)
+def _version():
+    # version detector. Precedence: installed dist, git, 'UNKNOWN'
+    from importlib.metadata import PackageNotFoundError, version
+    try:
+        return version('git-fame')
+    except PackageNotFoundError:
+        return "UNKNOWN"
+
+
+def __getattr__(name):
+    """Lazy `__version__` (`importlib.metadata` is slow to import)"""
+    if name == "__version__":
+        return _version()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@lru_cache(maxsize=None)
+def _tabber():
+    """`tabulate`, imported upon first use (with the `fame` format registered)"""
+    import tabulate as tabber
+    tabber._table_formats['fame'] = tabber.TableFormat(
+        lineabove=None, linebelowheader=tabber.Line("", "─", "┼", ""), linebetweenrows=None,
+        linebelow=tabber.Line("", "─", "┴", ""), headerrow=tabber.DataRow("", "│", ""),
+        datarow=tabber.DataRow("", "│", ""), padding=1, with_header_hide=None)
+    return tabber
+
+
+class _Formats(Sequence):
+    """All `--format`s, only importing `tabulate` if needed"""
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _all():
+        tabber = _tabber()
+        res = ['yaml', 'yml', 'json', 'jsonl', 'csv', 'tsv', 'partial']
+        res.extend(['svg', 'md', 'markdown', 'tabulate'])
+        res.extend(tabber._table_formats)
+        res.extend(f"svg-{i}" for i in tabber._table_formats
+                   if not re.search("asciidoc|html|jira|latex|mediawiki|moinmoin|textile|tsv|youtrack", i))
+        return res
+
+    def __contains__(self, fmt):
+        return fmt in FORMATS_BUILTIN or fmt in self._all()
+
+    def __getitem__(self, i):
+        return self._all()[i]
+
+    def __len__(self):
+        return len(self._all())
+
+
+FORMATS = _Formats()
 
 
 def hours(dates, maxCommitDiffInSec=120 * 60, firstCommitAdditionInMinutes=120):
     """
-    Convert list of commit times (in seconds) to an estimate of hours spent.
+    Convert (unique) commit times (in seconds) to an estimate of hours spent.
 
     https://github.com/kimmobrunfeldt/git-hours/blob/\
 8aaeee237cb9d9028e7a2592a25ad8468b1f45e4/index.js#L114-L143
@@ -132,8 +225,13 @@ def hours(dates, maxCommitDiffInSec=120 * 60, firstCommitAdditionInMinutes=120):
 
 
 def table2svg(table, backend):
+    return ''.join(_iter_svg(table, backend))
+
+
+def _iter_svg(table, backend):
+    """`table2svg`, yielding one chunk per row"""
     from xml.sax.saxutils import escape  # nosec B406, yapf: disable
-    table_fmt = tabber._table_formats[backend]
+    table_fmt = _tabber()._table_formats[backend]
     seps = {
         getattr(fmtrow, i, None)
         for attr in ('lineabove', 'linebelowheader', 'linebetweenrows', 'linebelow', 'headerrow', 'datarow')
@@ -158,13 +256,15 @@ def table2svg(table, backend):
                    f' lengthAdjust="spacingAndGlyphs">{escape(cell)}</tspan>')
             col += len(cell)
 
-    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{svg_width:g}" height="{svg_height:g}"'
-            f' viewBox="0 0 {svg_width:g} {svg_height:g}">'
-            '<rect x="0" y="0" width="100%" height="100%"'
-            ' fill="white" fill-opacity="0.5" rx="5"/>'
-            f'<text x="0" y="0.2em" font-size="{font_size}"'
-            ' font-family="monospace" style="white-space: pre">' +
-            ''.join(f'<tspan x="0" dy="1em">{"".join(cells(row))}</tspan>' for row in rows) + '</text></svg>')
+    yield (f'<svg xmlns="http://www.w3.org/2000/svg" width="{svg_width:g}" height="{svg_height:g}"'
+           f' viewBox="0 0 {svg_width:g} {svg_height:g}">'
+           '<rect x="0" y="0" width="100%" height="100%"'
+           ' fill="white" fill-opacity="0.5" rx="5"/>'
+           f'<text x="0" y="0.2em" font-size="{font_size}"'
+           ' font-family="monospace" style="white-space: pre">')
+    for row in rows:
+        yield f'<tspan x="0" dy="1em">{"".join(cells(row))}</tspan>'
+    yield '</text></svg>'
 
 
 def tabulate(auth_stats, stats_tot, sort='loc', bytype=False, backend='md', cost=None, row_nums=False, min_sort_val=0,
@@ -174,6 +274,111 @@ def tabulate(auth_stats, stats_tot, sort='loc', bytype=False, backend='md', cost
       Any tabulate format can prefixed by `svg-`.
       e.g.: md, rst, rounded_outline, svg-rounded_outline, ...
     """
+    return ''.join(iter_tabulate(auth_stats, stats_tot, sort, bytype, backend, cost, row_nums, min_sort_val, width))
+
+
+def _iter_structured(tab, backend, chunk_size=1 << 16):
+    """
+    Yields chunks of `tab` (`{"total": dict, "data": [row, ...], "columns":
+    [name, ...]}`, optionally with more such tables as extra keys) as
+    `backend` (yaml|json|csv|tsv).
+    """
+    extra = {k: v for k, v in tab.items() if k not in ("total", "data", "columns")}
+    if backend in ('yaml', 'yml'):
+        log.debug("backend:yaml")
+        try:
+            import yaml
+        except ImportError as exc:
+            raise RuntimeError('Try: pip install "git-fame[yaml]"') from exc
+        yield yaml.safe_dump(tab).rstrip()
+    elif backend == 'json':
+        log.debug("backend:json")
+        # same as `json.dumps(tab, ensure_ascii=False)`, but row by row
+        yield f'{{"total": {json.dumps(tab["total"], ensure_ascii=False)}, "data": ['
+        for i, row in enumerate(tab["data"]):
+            yield (', ' if i else '') + json.dumps(row, ensure_ascii=False)
+        yield f'], "columns": {json.dumps(tab["columns"], ensure_ascii=False)}'
+        for k, v in extra.items():
+            yield f', {json.dumps(k)}: {json.dumps(v, ensure_ascii=False)}'
+        yield '}'
+    elif backend in ('csv', 'tsv'):
+        log.debug("backend:csv")
+        import csv
+        from io import StringIO
+
+        res = StringIO()
+        t = csv.writer(res, delimiter=',' if backend == 'csv' else '\t')
+        for i, table in enumerate([tab] + list(extra.values())):
+            if i:
+                t.writerow('')
+            t.writerow(table['columns'])
+            for row in table['data']:
+                t.writerow(row)
+                if res.tell() >= chunk_size:
+                    yield res.getvalue()
+                    res.seek(0)
+                    res.truncate()
+            t.writerow('')
+            t.writerow(list(table['total'].keys()))
+            t.writerow(list(table['total'].values()))
+        yield res.getvalue().rstrip()
+    else:      # pragma: nocover
+        raise RuntimeError("Should be unreachable")
+
+
+def _iter_partial(auth_stats):
+    """
+    Yields chunks of JSON `{"partial": 1, "authors": {"<author>": stats}}`
+    (sets as sorted lists) for `load_partial`.
+    """
+    yield '{"partial": 1, "authors": {'
+    for i, (auth, stats) in enumerate(auth_stats.items()):
+        stats = {k: sorted(v) if isinstance(v, Set) else v for k, v in stats.items()}
+        yield (', ' if i else '') + f'{json.dumps(auth, ensure_ascii=False)}: {json.dumps(stats, ensure_ascii=False)}'
+    yield '}}'
+
+
+def load_partial(text, paths=None):
+    """
+    Inverse of `tabulate(..., backend="partial")`, returning `auth_stats`.
+
+    paths  : `PathTable` for `files` [default: new].
+    """
+    res = json.loads(text)
+    if not isinstance(res, dict) or res.get("partial") != 1:
+        raise ValueError("Not a `git-fame --format=partial` result")
+    paths = PathTable() if paths is None else paths
+    return {
+        auth: defaultdict(int, {
+            k: (FileSet(paths, v) if k == "files" else set(v)) if isinstance(v, list) else v
+            for k, v in stats.items()})
+        for auth, stats in res["authors"].items()}
+
+
+def _group_table(auth_stats, authors, kind):
+    """
+    Returns `(groups, rows, totals)`: `[[author, loc, ...], ...]` (for each
+    of `authors`) & `[loc, ...]` (over all `auth_stats`) per group of `kind`
+    (one of `GROUPS`), sorted by descending total.
+    """
+    totals = defaultdict(int)
+    for stats in auth_stats.values():
+        for group, loc in stats.get(kind, {}).items():
+            totals[group] += loc
+    groups = sorted(totals, key=lambda group: (-totals[group], group))
+    rows = [[auth] + [auth_stats[auth].get(kind, {}).get(group, 0) for group in groups] for auth in authors]
+    return groups, rows, [totals[group] for group in groups]
+
+
+def iter_tabulate(auth_stats, stats_tot, sort='loc', bytype=False, backend='md', cost=None, row_nums=False,
+                  min_sort_val=0, width=TERM_WIDTH, chunk_size=1 << 16):
+    """
+    `tabulate`, yielding chunks (of about `chunk_size` characters, or one per
+    row, where possible) as they are rendered rather than one giant string.
+    """
+    if backend.lower() == "partial":
+        yield from _iter_partial(auth_stats)
+        return
     COL_NAMES = ['Author', 'loc', 'coms', 'fils', ' distribution']
     # get ready
     tab = [[
@@ -202,83 +407,519 @@ def tabulate(auth_stats, stats_tot, sort='loc', bytype=False, backend='md', cost
     if min_sort_val:
         tab = [i for i in tab if i[COL_NAMES.index(sort)] >= min_sort_val]
     tab.sort(key=lambda i: i[COL_NAMES.index(sort)], reverse=True)
+    # `{kind: (groups, rows, totals)}` of the same authors as `tab`
+    groups = {
+        kind: _group_table(auth_stats, [i[0] for i in tab], kind)
+        for kind in GROUPS if any(kind in s for s in auth_stats.values())}
     if row_nums:
         tab = [[str(i)] + j for i, j in enumerate(tab, 1)]
         COL_NAMES.insert(0, '#')
+        groups = {
+            kind: (names, [[str(i)] + j for i, j in enumerate(rows, 1)], totals)
+            for kind, (names, rows, totals) in groups.items()}
+    first = ['#', 'Author'] if row_nums else ['Author']
 
     totals = 'Total ' + '\nTotal '.join("%s: %s" % i for i in sorted(stats_tot.items())) + '\n'
 
     if (backend := backend.lower()) in ("tabulate", "md", "markdown"):
         backend = "pipe"
+    elif backend == "jsonl": # final record after streamed per-file ones
+        backend = "json"
     if svg := backend.startswith("svg"):
         backend = backend[3:].lstrip('-') or 'fame'
 
     if backend in ('yaml', 'yml', 'json', 'csv', 'tsv'):
         tab = [i[:-1] + [float(pc.strip()) for pc in i[-1].split('/')] for i in tab]
         tab = {"total": stats_tot, "data": tab, "columns": COL_NAMES[:-1] + ['%' + i for i in COL_NAMES[-4:-1]]}
-        if backend in ('yaml', 'yml'):
-            log.debug("backend:yaml")
-            try:
-                import yaml
-            except ImportError as exc:
-                raise RuntimeError('Try: pip install "git-fame[yaml]"') from exc
-            return yaml.safe_dump(tab).rstrip()
-        elif backend == 'json':
-            log.debug("backend:json")
-            import json
-            return json.dumps(tab, ensure_ascii=False)
-        elif backend in ('csv', 'tsv'):
-            log.debug("backend:csv")
-            import csv
-            from io import StringIO
-
-            res = StringIO()
-            t = csv.writer(res, delimiter=',' if backend == 'csv' else '\t')
-            t.writerow(tab['columns'])
-            t.writerows(tab['data'])
-            t.writerow('')
-            t.writerow(list(tab['total'].keys()))
-            t.writerow(list(tab['total'].values()))
-            return res.getvalue().rstrip()
-        else:      # pragma: nocover
-            raise RuntimeError("Should be unreachable")
+        for kind, (names, rows, totals) in groups.items():
+            tab[kind] = {"total": dict(zip(names, totals)), "data": rows, "columns": first + names}
+        yield from _iter_structured(tab, backend, chunk_size)
+        return
 
-    if backend not in tabber._table_formats:
+    if backend not in (tabber := _tabber())._table_formats:
         raise ValueError(f"Unknown backend:{backend}")
     log.debug("backend:tabulate:%s", backend)
     COL_LENS = [max(len(Str(i[j])) for i in [COL_NAMES] + tab) for j in range(len(COL_NAMES))]
     COL_LENS[0] = min(width - sum(COL_LENS[1:]) - len(COL_LENS) * 3 - 4, COL_LENS[0])
     tab = [[i[0][:COL_LENS[0]]] + i[1:] for i in tab]
     table = tabber.tabulate(tab, COL_NAMES, tablefmt=backend, floatfmt='.0f')
+    for kind, (names, rows, group_totals) in groups.items():
+        table += f"\n\nloc by {GROUPS[kind]}\n" + tabber.tabulate(
+            rows + [[""] * row_nums + ["Total"] + group_totals], first + names, tablefmt=backend)
     if svg:
-        return table2svg(table, backend)
-    return totals + table
+        yield from _iter_svg(table, backend)
+    else:
+        yield totals
+        yield table
+
+
+def _blame_parser(bounds=False):
+    """
+    Generator parsing `git blame --porcelain` output lines as they arrive.
+    Yields dict: {"<author>": {"loc": int, "ctimes": {int}}}, which is updated
+    in-place with each (iterable of) line(s) subsequently sent.
+
+    bounds  : bool, whether to skip boundary commits (preventing the user with
+      the nearest commit to a `--since`/`--until` boundary owning the LOC).
+    """
+    tally = {}
+    # metadata is only output the first time each commit is seen
+    commits = {} # {sha: {"author": str, "author-mail": str, "committer-time": str, ...}}
+    # parsed metadata
+    commit_stats = {} # {sha: (tally["<author>"], committer_time)}
+    header, sha, loc = True, None, 0
+    while True:
+        for line in (yield tally):
+            if line.startswith('\t'): # content line ends each header
+                if loc and not (bounds and 'boundary' in commits[sha]): # first line of a chunk
+                    if sha not in commit_stats:
+                        meta = commits[sha]
+                        commit_stats[sha] = (tally.setdefault(f"{meta['author']} {meta['author-mail']}",
+                                                              {"loc": 0, "ctimes": set()}),
+                                             int(meta['committer-time']))
+                    stats, tstamp = commit_stats[sha]
+                    stats["loc"] += loc
+                    stats["ctimes"].add(tstamp)
+                header = True
+            elif header: # `<sha1> <orig_line> <final_line> [<chunk_lines>]`
+                sha, *chunk = line.split()
+                loc = int(chunk[2]) if len(chunk) > 2 else 0
+                commits.setdefault(sha, {})
+                header = False
+            else:
+                key, _, val = line.rstrip('\r\n').partition(' ')
+                commits[sha][key] = val
+
+
+def _blame_tally(lines, bounds=False):
+    """
+    Parse `git blame --porcelain` output lines.
+    Returns dict: {"<author>": {"loc": int, "ctimes": {int}}}
+    """
+    parser = _blame_parser(bounds)
+    next(parser)
+    return parser.send(lines)
+
+
+def _blame_file(blame_cmd, bounds, fname, lines=None):
+    """Blame one file (only `lines` `"<start>,<end>"` if specified).
+    Returns `tally_or_exception` so that failures stay in input order and
+    are reported by the caller."""
+    blame_cmd = blame_cmd + (["-L", lines] if lines else []) + [fname]
+    try:
+        return _blame_tally(iter_output(blame_cmd, stderr=subprocess.STDOUT), bounds=bounds)
+    except Exception as err:
+        return err
+
+
+def _blame_files(blame_cmd, bounds, fnames):
+    """`_blame_file` of each of `fnames` (as one task). Returns `[tally_or_exception, ...]`"""
+    return [_blame_file(blame_cmd, bounds, fname) for fname in fnames]
+
+
+async def _ablame_file(blame_cmd, bounds, fname, lines=None):
+    """`asyncio` equivalent of `_blame_file`, parsing output as it arrives"""
+    import asyncio
+    blame_cmd = blame_cmd + (["-L", lines] if lines else []) + [fname]
+    log.debug(' '.join(blame_cmd[3:]))
+    try:
+        proc = await asyncio.create_subprocess_exec(*blame_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        parser = _blame_parser(bounds)
+        tally = next(parser)
+        buf = b''
+        while chunk := await proc.stdout.read(1 << 16):
+            # only parse complete lines
+            lines, _, buf = (buf + chunk).rpartition(b'\n')
+            if lines:
+                parser.send(lines.decode('utf-8', errors='replace').split('\n'))
+        if buf:
+            parser.send([buf.decode('utf-8', errors='replace')])
+        if await proc.wait():
+            raise subprocess.CalledProcessError(proc.returncode, blame_cmd)
+        return tally
+    except Exception as err:
+        return err
+
+
+def _log_numstat(lines, renames=None):
+    """
+    Parse `git log --format="aN%aN aE%aE ct%ct" --numstat` output lines
+    (newest first) as they arrive.
+    Yields `(name, email, committer_time, [(insertions, deletions, fname), ...])`
+    per commit, with renamed `fname`s (including in commits before the rename)
+    resolved to their newest path.
+
+    renames  : dict, updated with `{old_fname: newest_fname}`.
+    """
+    renames = {} if renames is None else renames
+    commit = None
+    for line in lines:
+        if not (line := line.rstrip('\r\n')):
+            continue
+        if header := RE_AUTH_LOG.match(line):
+            if commit:
+                yield commit
+            name, email, tstamp = header.groups()
+            commit = name, email, int(tstamp), []
+            continue
+        try:
+            inss, dels, fname = line.split('\t')
+        except ValueError:
+            log.warning(line)
+            continue
+        if ' => ' in fname: # rename
+            if '{' in fname: # e.g. `a/{b => }/c` -> `a/c`
+                old, fname = (RE_RENAME.sub(i, fname).replace('//', '/').lstrip('/') for i in (r'\1', r'\2'))
+            else:
+                old, fname = fname.split(' => ')
+            fname = renames[old] = renames.get(fname, fname)
+        else:
+            fname = renames.get(fname, fname)
+        if commit:
+            commit[3].append((inss, dels, fname))
+    if commit:
+        yield commit
+
+
+def _line_counts(git_cmd, shas):
+    """Returns `{sha: number_of_lines}` of the given blobs"""
+    res = {}
+    with subprocess.Popen(git_cmd + ["cat-file", "--batch"], stdin=subprocess.PIPE,
+                          stdout=subprocess.PIPE) as proc: # nosec B603
+        for sha in shas:
+            proc.stdin.write(sha.encode('U8') + b'\n')
+            proc.stdin.flush()
+            size = int(proc.stdout.readline().split()[2])
+            lines, last = 0, b'\n'
+            while size > 0:
+                chunk = proc.stdout.read(min(size, 1 << 20))
+                size -= len(chunk)
+                lines += chunk.count(b'\n')
+                last = chunk[-1:] or last
+            res[sha] = lines + (last != b'\n') # unterminated last line
+            proc.stdout.read(1) # trailing newline
+        proc.stdin.close()
+    return res
+
+
+def _line_ranges(lines, parts):
+    """Returns `["<start>,<end>", ...]` (for `git blame -L`) splitting `lines` into `parts`"""
+    step = -(-lines // parts)
+    return [f"{start},{min(start + step - 1, lines)}" for start in range(1, lines + 1, step)]
+
+
+def _merge_tallies(tallies):
+    """Returns the sum of `_blame_file` tallies (or the first exception)"""
+    res = {}
+    for tally in tallies:
+        if isinstance(tally, Exception):
+            return tally
+        for auth, stats in tally.items():
+            if auth in res:
+                res[auth]["loc"] += stats["loc"]
+                res[auth]["ctimes"].update(stats["ctimes"])
+            else:
+                res[auth] = {"loc": stats["loc"], "ctimes": set(stats["ctimes"])}
+    return res
+
+
+def _gather(futures):
+    """
+    Returns a `Future` of `_merge_tallies` of the results of `futures` once
+    all are done (or of the first exception raised by any of them, upon which
+    the rest are cancelled). Cancelling it cancels any remaining `futures`.
+    """
+    res, remaining, lock = Future(), [len(futures)], threading.Lock()
+
+    def done(fut):
+        with lock:
+            remaining[0] -= 1
+            last = not remaining[0]
+        try:
+            if not fut.cancelled() and (exc := fut.exception()) is not None:
+                res.set_exception(exc)
+            elif not last:
+                return
+            elif any(i.cancelled() for i in futures):
+                res.cancel()
+            else:
+                res.set_result(_merge_tallies([i.result() for i in futures]))
+        except InvalidStateError: # already done
+            pass
+
+    def finished(_):
+        if res.cancelled() or res.exception() is not None:
+            for fut in futures:
+                fut.cancel()
+
+    res.add_done_callback(finished)
+    for fut in futures:
+        fut.add_done_callback(done)
+    return res
+
+
+def _scatter(future, num):
+    """
+    Returns `num` `Future`s of each item of the (list) result of `future`
+    (or its exception). Cancelling all of them cancels `future`.
+    """
+    parts = [Future() for _ in range(num)]
+
+    def done(fut):
+        for i, part in enumerate(parts):
+            try:
+                if fut.cancelled():
+                    part.cancel()
+                elif (exc := fut.exception()) is not None:
+                    part.set_exception(exc)
+                else:
+                    part.set_result(fut.result()[i])
+            except InvalidStateError: # already cancelled
+                pass
+
+    def cancelled(_):
+        if all(part.cancelled() for part in parts):
+            future.cancel()
+
+    for part in parts:
+        part.add_done_callback(cancelled)
+    future.add_done_callback(done)
+    return parts
+
+
+def _journal(checkpoint, repo, opts, commit, fname, fut):
+    """`Future` callback appending a successful `_blame_file` result to `checkpoint`"""
+    if not fut.cancelled() and fut.exception() is None and not isinstance(tally := fut.result(), Exception):
+        checkpoint.append(repo, opts, commit, fname, tally)
+
+
+@contextmanager
+def _cancelling(futures):
+    """Cancel any remaining `{key: Future}` upon exit (e.g. errors or `cancel`)"""
+    try:
+        yield futures
+    finally:
+        for fut in futures.values():
+            fut.cancel()
+
+
+def _file_matcher(files):
+    """`files` (regex or collection of paths, as per `_file_filters`) -> predicate (`None` if empty)"""
+    if hasattr(files, 'search'):
+        return files.search
+    return files.__contains__ if files else None
+
+
+def _filter_files(file_list, include_files=None, exclude_files=None):
+    """
+    Returns the (ordered) subset of `file_list` matching `_file_filters`
+    (each of which may independently be a regex or a collection of paths).
+    """
+    incl, excl = _file_matcher(include_files), _file_matcher(exclude_files)
+    return [i for i in file_list if (incl is None or incl(i)) if not (excl is not None and excl(i))]
+
+
+def _shard_files(file_list, sizes, shard):
+    """
+    Returns the (ordered) subset of `file_list` in `shard` (`(i, n)`, 1-based)
+    of `n` partitions balanced by `sizes` (`{fname: bytes}`), largest first.
+    """
+    index, count = shard
+    loads = [(0, i) for i in range(1, count + 1)] # `(bytes, shard)` heap
+    res = set()
+    for fname in sorted(file_list, key=lambda f: (-sizes[f], f)):
+        load, i = heapq.heappop(loads)
+        if i == index:
+            res.add(fname)
+        heapq.heappush(loads, (load + sizes[fname], i))
+    return [f for f in file_list if f in res]
+
+
+def _new_stats(paths=None):
+    """Empty stats of an author, with `files` interned in `paths` (`PathTable`)"""
+    return defaultdict(int, files=FileSet(paths), ctimes=set())
+
+
+def _file_groups(fname, bytype=False, by_dir=0, prefix=None):
+    """
+    Returns `((kind, group), ...)` of `fname` for `_extend_stats`, where `kind`
+    is one of `GROUPS`. Directories are prefixed by `prefix` (if any).
+    """
+    res = ()
+    if bytype:
+        res += (("bytype", f".{fext(fname) or '_None_ext'}"),)
+    if by_dir:
+        group = fdir(fname, by_dir)
+        if prefix:
+            group = prefix if group == '.' else path.join(prefix, group)
+        res += (("bydir", group),)
+    return res
+
+
+def _extend_stats(auth_stats, paths, fid, auth, loc, tstamps, groups=()):
+    """
+    Add one file's (`paths.paths[fid]`, as per `PathTable.intern`) `loc` &
+    commit times `tstamps` to `auth_stats[auth]`, also adding `loc` to
+    `auth_stats[auth][kind][group]` for each of its `groups` (as per `_file_groups`).
+    """
+    if auth not in auth_stats:
+        auth_stats[auth] = _new_stats(paths)
+    stats = auth_stats[auth]
+    stats["loc"] += loc
+    stats["files"].ids.append(fid)
+    stats["ctimes"].update(tstamps)
+    for kind, group in groups:
+        tally = stats.setdefault(kind, {})
+        tally[group] = tally.get(group, 0) + loc
+
+
+def _file_digest(fname):
+    try:
+        with open(fname, 'rb') as fd:
+            return hashlib.sha1(fd.read()).hexdigest() # nosec B324
+    except OSError:
+        return None
+
+
+def _blame_opts_digest(git_cmd, blame_args, since, until, ignore_rev, ignore_revs_file):
+    """Digest of everything (other than history) which affects `git blame` output"""
+    key = [SCHEMA, blame_args]
+    # resolve relative dates & revisions
+    for opt in since, until:
+        if opt:
+            key.append(check_output(git_cmd + ["rev-parse", f"{opt[0]}={opt[1]}"]).strip())
+    if ignore_rev:
+        key.append(check_output(git_cmd + ["rev-parse", "--verify", "-q", f"{ignore_rev}^{{commit}}"]).strip())
+    if ignore_revs_file:
+        key.append(_file_digest(path.join(git_cmd[2], ignore_revs_file)))
+    key.append(_file_digest(path.join(git_cmd[2], '.mailmap')))
+    return hashlib.sha1(json.dumps(key).encode('U8')).hexdigest() # nosec B324
+
+
+def _is_ancestor(git_cmd, commit, tip):
+    return subprocess.call(git_cmd + ["merge-base", "--is-ancestor", commit, tip], stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL) == 0 # nosec B603
+
+
+def _touched_since(git_cmd, commit, tip):
+    """
+    Returns set of paths modified by any commit in `commit..tip`,
+    or `None` if `commit` is not an ancestor of `tip`.
+    """
+    if commit == tip:
+        return set()
+    if not _is_ancestor(git_cmd, commit, tip):
+        return None
+    return set(check_output(git_cmd + ["log", "--format=", "--name-only", "-m", "--no-renames",
+                                       f"{commit}..{tip}"]).split('\n')) - {''}
+
+
+def _binary_files(git_cmd, file_list, blobs, cache=None):
+    """
+    Returns the subset of `file_list` which is binary, empty, or marked as
+    binary or `-diff` in `.gitattributes` (consistent with `git grep -I .`).
+
+    blobs  : dict, {fname: (sha, bytes)}
+    cache  : `BlameCache` in which to cache content checks per blob
+    """
+    res = {fname for fname in file_list if not blobs[fname][1]}
+    if not (todo := [fname for fname in file_list if fname not in res]):
+        return res
+
+    attrs = check_output(git_cmd + ["check-attr", "-z", "--stdin", "binary", "diff"],
+                         stdin=subprocess.PIPE, input='\0'.join(todo).encode('U8')).split('\0')
+    for fname, attr, val in zip(attrs[::3], attrs[1::3], attrs[2::3]):
+        if (attr, val) in {("binary", "set"), ("diff", "unset")}:
+            res.add(fname)
+
+    shas = {blobs[fname][0] for fname in todo if fname not in res}
+    known = cache.lookup_blobs(shas) if cache else {}
+    if todo_shas := [sha for sha in shas if sha not in known]:
+        checked = {}
+        # only read the first `BINARY_CHECK_BYTES` of each blob
+        with subprocess.Popen(git_cmd + ["cat-file", "--batch"], stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE) as proc: # nosec B603
+            for sha in todo_shas:
+                proc.stdin.write(sha.encode('U8') + b'\n')
+                proc.stdin.flush()
+                size = int(proc.stdout.readline().split()[2])
+                head = proc.stdout.read(min(size, BINARY_CHECK_BYTES))
+                checked[sha] = b'\0' in head
+                # discard the rest (& trailing newline)
+                size -= len(head) - 1
+                while size > 0:
+                    size -= len(proc.stdout.read(min(size, 1 << 20)))
+            proc.stdin.close()
+        if cache:
+            cache.store_blobs(checked)
+        known.update(checked)
+    res.update(fname for fname in todo if known.get(blobs[fname][0]))
+    return res
 
 
 def _get_auth_stats(gitdir, branch="HEAD", since=None, include_files=None, exclude_files=None, silent_progress=False,
                     ignore_whitespace=False, M=False, C=False, warn_binary=False, bytype=False, show=None,
-                    prefix_gitdir=False, churn=None, ignore_rev="", ignore_revs_file=None, until=None, jobs=None):
-    """Returns dict: {"<author>": {"loc": int, "files": {}, "commits": int, "ctimes": [int]}}"""
+                    prefix_gitdir=False, churn=None, ignore_rev="", ignore_revs_file=None, until=None, jobs=None,
+                    cache_dir=None, incremental=False, jobs_mode="thread", scheduler=None, on_file=None, cancel=None,
+                    shard=None, checkpoint=None, paths=None, by_dir=0, split_bytes=BLAME_SPLIT_BYTES):
+    """
+    Returns dict: {"<author>": {"loc": int, "files": {}, "commits": int, "ctimes": {int}}}
+    (also including `{"bytype": {".<ext>": loc}}` if `bytype`, and
+    `{"bydir": {"<dir>": loc}}` if `by_dir`).
+
+    scheduler  : `Scheduler` to run `git blame`s in [default: `Scheduler(jobs, jobs_mode)`].
+    on_file  : callable, `on_file(gitdir, fname, tally)` is called for each
+      file as soon as its `tally` ({"<name> <<email>>": {"loc": int, "ctimes": {int}}})
+      is available.
+    cancel  : `threading.Event`, stop processing (raising `CancelledError`) once set.
+    shard  : `(i, n)`, only process the `i`th (1-based) of `n` partitions of
+      files (as per `_shard_files`), and only count commits if `i == 1`.
+    checkpoint  : `Checkpoint`, resume from (& journal) per-file tallies.
+    paths  : `PathTable` in which to intern `files` [default: new].
+    by_dir  : int, directory depth to group by (as per `_file_groups`).
+    split_bytes  : int, blame files larger than this in line ranges of about
+      this size (at most one per `scheduler` job) in parallel (0 to disable).
+    """
     until = ["--until", until] if until else []
     since = ["--since", since] if since else []
     show = show or SHOW_NAME
     git_cmd = ["git", "-C", gitdir]
     log.debug("base command:%s", git_cmd)
-    file_list = check_output(git_cmd + ["ls-files", "--with-tree", branch]).strip().split('\n')
-    text_file_list = check_output(git_cmd + ["grep", "-I", "--name-only", ".", branch]).strip()
-    text_file_list = set(re.sub(f"^{re.escape(branch)}:", "", text_file_list, flags=re.M).split('\n'))
-    if not hasattr(include_files, 'search'):
-        file_list = [i for i in file_list if (not include_files or (i in include_files)) if i not in exclude_files]
-    else:
-        file_list = [i for i in file_list if include_files.search(i) if not (exclude_files and exclude_files.search(i))]
-    for fname in set(file_list) - text_file_list:
-        getattr(log, "warn" if warn_binary else "debug")("binary:%s", fname.strip())
-    file_list = [f for f in file_list if f in text_file_list] # preserve order
+    churn = churn or CHURN_SLOC
+    cache = None
+    if cache_dir:
+        import sqlite3
+        try:
+            cache = BlameCache(cache_dir)
+        except (OSError, sqlite3.Error) as err:
+            log.warning("cache disabled:%s", err)
+    elif incremental:
+        log.warning("--incremental requires the cache")
+
+    # count other `git` processes towards the shared `scheduler`'s limit
+    slot = nullcontext if scheduler is None else scheduler.slot
+    blobs = {} # {fname: (sha, bytes)}
+    with span("ls-tree", repo=gitdir) as trace, slot():
+        tree = check_output(git_cmd + ["ls-tree", "-r", "-l", branch])
+        trace["bytes"] = len(tree)
+        for line in tree.splitlines():
+            meta, _, fname = line.partition('\t')
+            if (meta := meta.split())[1] == 'blob':
+                blobs[fname] = meta[2], int(meta[3])
+        del tree
+    file_list = _filter_files(blobs, include_files, exclude_files)
+    with span("binary-check", repo=gitdir, files=len(file_list)), slot():
+        binary = _binary_files(git_cmd, file_list, blobs, cache)
+    for fname in file_list:
+        if fname in binary:
+            getattr(log, "warning" if warn_binary else "debug")("binary:%s", fname)
+    file_list = [f for f in file_list if f not in binary] # preserve order
+    if shard:
+        file_list = _shard_files(file_list, {f: blobs[f][1] for f in file_list}, shard)
     log.log(logging.NOTSET, "files:%s", file_list)
-    churn = churn or set()
 
     if churn & CHURN_SLOC:
-        base_cmd = git_cmd + ["blame", "--line-porcelain"] + since + until
+        base_cmd = git_cmd + ["blame", "--porcelain"] + since + until
         if ignore_rev:
             base_cmd.extend(["--ignore-rev", ignore_rev])
         if ignore_revs_file:
@@ -294,101 +935,206 @@ def _get_auth_stats(gitdir, branch="HEAD", since=None, include_files=None, exclu
         base_cmd.extend(["-C", "-C"]) # twice to include file creation
 
     auth_stats = {}
+    paths = PathTable() if paths is None else paths
+    stats_extend = partial(_extend_stats, auth_stats, paths)
+    file_groups = partial(_file_groups, bytype=bytype, by_dir=by_dir, prefix=gitdir if prefix_gitdir else None)
 
-    def stats_append(fname, auth, loc, tstamp):
-        tstamp = int(tstamp)
-        if (auth := str(auth)) not in auth_stats:
-            auth_stats[auth] = defaultdict(int, files=set(), ctimes=[])
-        auth_stats[auth]["loc"] += loc
-        auth_stats[auth]["files"].add(fname)
-        auth_stats[auth]["ctimes"].append(tstamp)
-
-        if bytype:
-            fext_key = f".{fext(fname) or '_None_ext'}"
-            auth_stats[auth][fext_key] += loc
+    last_commit, state, changed = None, {}, None
+    if checkpoint and not churn & CHURN_SLOC:
+        log.warning("--checkpoint requires --loc=surviving")
+        checkpoint = None
+    if (cache and (churn & CHURN_SLOC or incremental)) or checkpoint:
+        with span("cache-key", repo=gitdir), slot():
+            tip = check_output(git_cmd + ["rev-parse", "--verify", "-q", f"{branch}^{{commit}}"]).strip()
+            repo = path.abspath(gitdir)
+            key_args = base_cmd[3:]
+            if not churn & CHURN_SLOC: # `--numstat` tallies depend on which lines are counted
+                key_args = key_args + [f"--loc=ins:{bool(churn & CHURN_INS)},del:{bool(churn & CHURN_DEL)}"]
+            opts = _blame_opts_digest(git_cmd, key_args, since, until, ignore_rev, ignore_revs_file)
+        if cache and incremental and (run := cache.last_run(repo, opts, branch)):
+            # NB: not `git diff`, which misses reverted changes (which `git blame` still attributes)
+            with slot():
+                changed = _touched_since(git_cmd, run[0], tip)
+            if changed is not None:
+                last_commit, state = run
+                log.debug("incremental:%s..%s:%d changed files", last_commit, tip, len(changed))
 
+    # `{"<author>": [name, email, commits]}`
+    commits = state.get("commits", {})
     if churn & CHURN_SLOC:
+        tallies = {}
+        if cache:
+            with span("cache-lookup", repo=gitdir), slot():
+                cached = defaultdict(dict)
+                for fname, (commit, tally) in cache.lookup(repo, opts, file_list).items():
+                    cached[commit][fname] = tally
+                for commit, commit_tallies in cached.items():
+                    touched = changed if commit == last_commit else _touched_since(git_cmd, commit, tip)
+                    if touched is not None:
+                        valid = {fname: tally for fname, tally in commit_tallies.items() if fname not in touched}
+                        if commit != tip:
+                            cache.touch(repo, opts, valid, tip)
+                        tallies.update(valid)
+            log.debug("cache hits:%d/%d", len(tallies), len(file_list))
+        resumed = {}
+        if checkpoint:
+            with span("checkpoint-lookup", repo=gitdir):
+                resumed = checkpoint.lookup(repo, opts, tip, [fname for fname in file_list if fname not in tallies])
+                tallies.update(resumed)
+            log.debug("checkpoint hits:%d/%d", len(resumed), len(file_list))
 
-        def blame_file(fname):
-            """Blame one file. Returns `(fname, output_or_exception)` so that
-            failures stay in input order and are reported by the caller."""
-            try:
-                return fname, check_output(base_cmd + [branch, fname], stderr=subprocess.STDOUT)
-            except Exception as err:
-                return fname, err
-
-        if jobs != 1 and mapper is not map:
-            # concurrent multi-file processing
-            _mapper = partial(mapper, max_workers=jobs)
-        else:
-
-            def _mapper(func, iterable, **kwargs):
-                return map(func, tqdm(iterable, **kwargs))
-
-        for fname, blame_out in _mapper(blame_file, file_list, desc=gitdir if prefix_gitdir else "Processing",
-                                        disable=silent_progress, unit="file"):
-            # `fname` is relative to `gitdir`, so only prefix the reported name
-            display_fname = path.join(gitdir, fname) if prefix_gitdir else fname
-            if isinstance(blame_out, Exception):
-                getattr(log, "warn" if warn_binary else "debug")(display_fname + ':' + str(blame_out))
-                continue
-            log.log(logging.NOTSET, blame_out)
+        sched = scheduler or Scheduler(jobs, jobs_mode)
+        blamer = partial(_ablame_file if sched.mode == "async" else _blame_file, base_cmd + [branch],
+                         bool(since or until))
+        todo = [fname for fname in file_list if fname not in tallies]
+        ranges = {} # `{fname: ["<start>,<end>", ...]}` of large files
+        if split_bytes and (large := {
+                fname: min(-(-blobs[fname][1] // split_bytes), sched.jobs)
+                for fname in todo if blobs[fname][1] > split_bytes}):
+            with span("line-count", repo=gitdir, files=len(large)), slot():
+                lines = _line_counts(git_cmd, {blobs[fname][0] for fname in large})
+            for fname, parts in large.items():
+                if (parts := min(parts, lines[blobs[fname][0]])) > 1:
+                    ranges[fname] = _line_ranges(lines[blobs[fname][0]], parts)
+            log.debug("split:%d files into %d ranges", len(ranges), sum(map(len, ranges.values())))
 
-            if since:
-                # Strip boundary messages,
-                # preventing user with nearest commit to boundary owning the LOC
-                blame_out = RE_BLAME_BOUNDS.sub('', blame_out)
+        def submit_batch(fnames, size):
+            """`{fname: Future}` of `fnames` blamed in one task"""
+            return zip(fnames, _scatter(sched.submit(
+                size, partial(_blame_files, *blamer.args), fnames,
+                trace={"name": "blame", "repo": gitdir, "file": ",".join(fnames), "files": len(fnames), "bytes": size}),
+                len(fnames)))
 
-            if until:
-                # Strip boundary messages,
-                # preventing user with nearest commit to boundary owning the LOC
-                blame_out = RE_BLAME_BOUNDS.sub('', blame_out)
+        futures = {}
+        batch, batch_size = [], 0 # small files, amortising inter-process communication
+        for fname in todo:
+            size = blobs[fname][1]
+            if fname in ranges:
+                futures[fname] = _gather([
+                    sched.submit(size // len(ranges[fname]), blamer, fname, lines,
+                                 trace={"name": "blame", "repo": gitdir, "file": fname, "lines": lines,
+                                        "bytes": size // len(ranges[fname])})
+                    for lines in ranges[fname]])
+            elif sched.mode == "process" and size < PROCESS_BATCH_BYTES:
+                batch.append(fname)
+                batch_size += size
+                if batch_size >= PROCESS_BATCH_BYTES or len(batch) >= PROCESS_BATCH_FILES:
+                    futures.update(submit_batch(batch, batch_size))
+                    batch, batch_size = [], 0
+            else:
+                futures[fname] = sched.submit(size, blamer, fname,
+                                              trace={"name": "blame", "repo": gitdir, "file": fname, "bytes": size})
+        if batch:
+            futures.update(submit_batch(batch, batch_size))
+        if checkpoint:
+            for fname, fut in futures.items(): # journal in order of completion
+                fut.add_done_callback(partial(_journal, checkpoint, repo, opts, tip, fname))
+        fresh = dict(resumed) if cache else {}
+        with span("blames", repo=gitdir, files=len(futures)), _cancelling(futures):
+            for fname in tqdm(file_list, desc=gitdir if prefix_gitdir else "Processing", disable=silent_progress,
+                              unit="file"):
+                tally = tallies[fname] if fname in tallies else futures.pop(fname).result()
+                # `fname` is relative to `gitdir`, so only prefix the reported name
+                display_fname = path.join(gitdir, fname) if prefix_gitdir else fname
+                if isinstance(tally, Exception):
+                    getattr(log, "warning" if warn_binary else "debug")(display_fname + ':' + str(tally))
+                    continue
+                if cache and fname not in tallies:
+                    fresh[fname] = tally
+                fid, groups = paths.intern(display_fname), file_groups(fname)
+                for auth, stats in tally.items():
+                    stats_extend(fid, auth, stats["loc"], stats["ctimes"], groups)
+                if on_file is not None:
+                    on_file(gitdir, fname, tally)
+                if cancel is not None and cancel.is_set():
+                    break
 
-            for loc, name, email, tstamp in RE_AUTHS_BLAME.findall(blame_out): # for each chunk
-                loc = int(loc)
-                auth = f'{name} <{email}>'
-                stats_append(display_fname, auth, loc, tstamp)
+        if sched is not scheduler:
+            sched.shutdown()
+        if cache:
+            with span("cache-store", repo=gitdir, files=len(fresh)):
+                cache.store(repo, opts, fresh, tip)
 
     else:
-        with tqdm(total=1, desc=gitdir if prefix_gitdir else "Processing", disable=silent_progress, unit="repo") as t:
-            blame_out = check_output(base_cmd + [branch], stderr=subprocess.STDOUT)
-            t.update()
-        log.log(logging.NOTSET, blame_out)
-
-        # Strip binary files
-        for fname in set(RE_STAT_BINARY.findall(blame_out)):
-            getattr(log, "warn" if warn_binary else "debug")("binary:%s", fname.strip())
-        blame_out = RE_STAT_BINARY.sub('', blame_out)
-
-        blame_out = RE_AUTHS_LOG.split(blame_out)
-        blame_out = zip(blame_out[1::4], blame_out[2::4], blame_out[3::4], blame_out[4::4])
-        for name, email, tstamp, fnames in blame_out:
-            auth = f'{name} <{email}>'
-            fnames = fnames.split('\naN', 1)[0]
-            for i in fnames.strip().split('\n'):
-                try:
-                    inss, dels, fname = i.split('\t')
-                except ValueError:
-                    log.warning(i)
-                else:
-                    if (fname := RE_RENAME.sub(r'\\2', fname)) in file_list:
+        # `{fname: tally}`, including historical files if `incremental`
+        tallies = {
+            fname: {auth: {"loc": stats["loc"], "ctimes": set(stats["ctimes"])} for auth, stats in tally.items()}
+            for fname, tally in state.get("files", {}).items()}
+        files = set(file_list)
+        binary = set()
+        renames = {} # `{old_fname: newest_fname}`
+        with span("log", repo=gitdir) as trace, slot():
+            log_out = metered(
+                iter_output(base_cmd + [f"{last_commit}..{tip}" if last_commit else branch], stderr=subprocess.STDOUT),
+                trace)
+            for name, email, tstamp, numstat in tqdm(_log_numstat(log_out, renames), unit="commit",
+                                                     disable=silent_progress,
+                                                     desc=gitdir if prefix_gitdir else "Processing"):
+                if cancel is not None and cancel.is_set():
+                    break
+                auth = f'{name} <{email}>'
+                # count commits (including merges, which have no `--numstat`)
+                commits.setdefault(auth, [name, email, 0])[2] += 1
+                for inss, dels, fname in numstat:
+                    if inss == '-': # binary
+                        if fname not in binary:
+                            binary.add(fname)
+                            getattr(log, "warning" if warn_binary else "debug")("binary:%s", fname)
+                    elif fname in files or incremental:
                         loc = int(inss) if churn & CHURN_INS and inss else 0
                         loc += int(dels) if churn & CHURN_DEL and dels else 0
-                        stats_append(fname, auth, loc, tstamp)
+                        stats = tallies.setdefault(fname, {}).setdefault(auth, {"loc": 0, "ctimes": set()})
+                        stats["loc"] += loc
+                        stats["ctimes"].add(tstamp)
+        # `incremental` tallies predate (so follow) any renames since
+        for old, new in renames.items():
+            if old != new and (tally := tallies.pop(old, None)):
+                tallies[new] = _merge_tallies([tallies.get(new, {}), tally])
+
+        for fname in file_list if cancel is None or not cancel.is_set() else []:
+            if tally := tallies.get(fname):
+                fid, groups = paths.intern(fname), file_groups(fname)
+                for auth, stats in tally.items():
+                    stats_extend(fid, auth, stats["loc"], stats["ctimes"], groups)
+            if on_file is not None and fname in tallies:
+                on_file(gitdir, fname, tallies[fname])
+
+    if cancel is not None and cancel.is_set():
+        if cache:
+            cache.close()
+        raise CancelledError(gitdir)
 
-    # quickly count commits (even if no surviving loc)
     log.log(logging.NOTSET, "authors:%s", list(auth_stats.keys()))
-    auth_commits = check_output(git_cmd + ["shortlog", "-s", "-e", branch] + since + until)
-    log.debug(RE_NCOM_AUTH_EM.findall(auth_commits.strip()))
+    if churn & CHURN_SLOC: # else already counted from `git log`
+        # quickly count commits (even if no surviving loc)
+        with span("shortlog", repo=gitdir) as trace, slot():
+            auth_commits = check_output(git_cmd + ["shortlog", "-s", "-e"] +
+                                        [f"{last_commit}..{tip}" if last_commit else branch] + since + until)
+            trace["bytes"] = len(auth_commits)
+        log.debug(RE_NCOM_AUTH_EM.findall(auth_commits.strip()))
+        for (ncom, name, em) in RE_NCOM_AUTH_EM.findall(auth_commits.strip()):
+            commits.setdefault(f'{name} <{em}>', [name, em, 0])[2] += int(ncom)
     auth2em = {}
     auth2name = {}
-    for (ncom, name, em) in RE_NCOM_AUTH_EM.findall(auth_commits.strip()):
-        auth = f'{name} <{em}>'
+    for auth, (name, em, ncom) in commits.items():
         auth2em[auth] = em
         auth2name[auth] = name
+        if shard and shard[0] != 1: # counted by the first shard only
+            if auth not in auth_stats:
+                continue
+            ncom = 0
         if auth not in auth_stats:
-            auth_stats[auth] = defaultdict(int, files=set(), ctimes=[])
-        auth_stats[auth]["commits"] += int(ncom)
+            auth_stats[auth] = _new_stats(paths)
+        auth_stats[auth]["commits"] += ncom
+
+    if cache:
+        if incremental:
+            state = {"commits": commits}
+            if not churn & CHURN_SLOC:
+                state["files"] = tallies
+            cache.save_run(repo, opts, branch, tip, state)
+        cache.close()
+
     if not (show & SHOW_NAME and show & SHOW_EMAIL): # replace author with either email or name
         auth2new = auth2em if (show & SHOW_EMAIL) else auth2name
         log.debug(auth2new)
@@ -399,16 +1145,155 @@ def _get_auth_stats(gitdir, branch="HEAD", since=None, include_files=None, exclu
             if auth not in auth2new:
                 # https://github.com/casperdcl/git-fame/issues/122
                 auth2new[auth] = re.match('(.*) <(.*)>$', auth).group(2 if (show & SHOW_EMAIL) else 1) or auth
-            i = auth_stats.setdefault(auth2new[auth], defaultdict(int, files=set(), ctimes=[]))
-            i["files"].update(stats["files"])
-            for k, v in stats.items():
-                if k != 'files':
-                    i[k] += v
+            merge_stats(auth_stats.setdefault(auth2new[auth], _new_stats(paths)), stats)
         del old
 
     return auth_stats
 
 
+async def get_auth_stats(gitdir, jobs=None, scheduler=None, **kwargs):
+    """
+    Awaitable version of `_get_auth_stats` (which accepts the same `kwargs`).
+    `git blame`s are run as subprocesses on the running event loop (at most
+    `jobs` at once), and everything else in a worker thread, so as not to
+    block the loop.
+
+    scheduler  : "async" `Scheduler` [default: `Scheduler(jobs, "async", loop=<running loop>)`].
+    """
+    import asyncio
+    sched = scheduler or Scheduler(jobs, "async", loop=asyncio.get_running_loop())
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, partial(_get_auth_stats, gitdir, scheduler=sched, **kwargs))
+    finally:
+        if sched is not scheduler:
+            sched.shutdown()
+
+
+def _show_author(auth, show):
+    """`"<name> <<email>>"` -> name and/or email (as per `show`)"""
+    if show & SHOW_NAME and show & SHOW_EMAIL:
+        return auth
+    return re.match('(.*) <(.*)>$', auth).group(2 if (show & SHOW_EMAIL) else 1) or auth
+
+
+def _jsonl_writer(show, stream=None):
+    """
+    Returns `on_file(gitdir, fname, tally)` for `_get_auth_stats`, writing one
+    JSON line per author to `stream` [default: `sys.stdout`].
+    """
+    lock = threading.Lock()
+
+    def on_file(gitdir, fname, tally):
+        records = [{"repo": gitdir, "file": fname, "author": _show_author(auth, show), "loc": stats["loc"]}
+                   for auth, stats in tally.items()]
+        out = stream or sys.stdout
+        with lock:
+            try:
+                out.write(''.join(json.dumps(i, ensure_ascii=False) + '\n' for i in records))
+            except UnicodeEncodeError:
+                out.write(''.join(json.dumps(i) + '\n' for i in records))
+            out.flush()
+
+    return on_file
+
+
+def _file_filters(incl=".*", excl="", no_regex=False):
+    """Returns `(include_files, exclude_files)` for `_get_auth_stats`"""
+    if no_regex:
+        exclude_files = set(RE_CSPILT.split(excl)) if excl else set()
+        include_files = set()
+        if incl != ".*":
+            include_files.update(RE_CSPILT.split(incl))
+    else:
+        # cannot use findall in case of grouping:
+        # for i in include_files:
+        # for i in [include_files]:
+        #   for j in range(1, len(i)):
+        #     if i[j] == '(' and i[j - 1] != '\\':
+        #       raise ValueError('Parenthesis must be escaped'
+        #                        ' in include-files:\n\t' + i)
+        exclude_files = re.compile(excl) if excl else None
+        include_files = re.compile(incl)
+        # include_files = re.compile(incl, flags=re.M)
+    return include_files, exclude_files
+
+
+def _churn_type(loc=None, cost=None):
+    """`--loc` (default depends on `--cost`) as a set"""
+    churn = set(loc.lower().split(',')) if loc else set()
+    if not churn:
+        cost = cost or set()
+        if cost & COST_HOURS:
+            churn = CHURN_INS | CHURN_DEL
+        elif cost & COST_MONTHS:
+            churn = CHURN_INS
+        else:
+            churn = CHURN_SLOC
+    return churn
+
+
+def _size(spec):
+    """`--max-memory` (e.g. `"4G"`) in bytes"""
+    if not (match := re.match(r"^(\d+(?:\.\d*)?)\s*([kmgt]?)i?b?$", spec.strip(), flags=re.I)):
+        raise ValueError(f"--max-memory={spec}: expected <number>[K|M|G|T]")
+    num, unit = match.groups()
+    return int(float(num) * (1024**("kmgt".index(unit.lower()) + 1) if unit else 1))
+
+
+def _shard(spec):
+    """`--shard` (`"i/n"`) as `(i, n)`"""
+    index, _, count = spec.partition('/')
+    try:
+        res = int(index), int(count)
+    except ValueError:
+        res = 0, 0
+    if not 1 <= res[0] <= res[1]:
+        raise ValueError(f"--shard={spec}: expected <i>/<n> (1 <= i <= n)")
+    return res
+
+
+def _fame(gitdirs, scheduler, silent_progress=False, **kwargs):
+    """
+    `_get_auth_stats(gitdir, **kwargs)` for all `gitdirs` (concurrently),
+    merged in a deterministic order.
+    Returns `(auth_stats, stats_tot)`.
+    """
+    auth_stats = {}
+    # `{"<author>": (gitdir index, index within gitdir)}` for deterministic ordering
+    auth_order = {}
+    with ThreadPoolExecutor(max_workers=scheduler.jobs if len(gitdirs) > 1 else 1) as repos:
+        # shared so that merging `files` is an integer set union
+        kwargs.setdefault("paths", PathTable())
+        statter = partial(_get_auth_stats, silent_progress=silent_progress, prefix_gitdir=len(gitdirs) > 1,
+                          scheduler=scheduler, **kwargs)
+        futures = {repos.submit(statter, gitdir): i for i, gitdir in enumerate(gitdirs)}
+        # merge (and free) each repo's stats as soon as it completes
+        for fut in tqdm(as_completed(futures), total=len(gitdirs), desc="Repos", unit="repo", miniters=1,
+                        disable=silent_progress or len(gitdirs) <= 1):
+            i = futures.pop(fut)
+            with span("merge", repo=gitdirs[i]):
+                for j, (auth, stats) in enumerate(fut.result().items()):
+                    if auth in auth_stats:
+                        merge_stats(auth_stats[auth], stats)
+                        auth_order[auth] = min(auth_order[auth], (i, j))
+                    else:
+                        auth_stats[auth] = stats
+                        auth_order[auth] = i, j
+    auth_stats = {auth: auth_stats[auth] for auth in sorted(auth_stats, key=auth_order.__getitem__)}
+    return auth_stats, _totals(auth_stats)
+
+
+def _totals(auth_stats):
+    """Returns `{key: total}` over all authors (excluding `GROUPS`)"""
+    stats_tot = {k: 0 for stats in auth_stats.values() for k in stats if k not in GROUPS}
+    log.debug(stats_tot)
+    for k in stats_tot:
+        stats_tot[k] = sum(int_cast_or_len(stats.get(k, 0)) for stats in auth_stats.values())
+    log.debug(stats_tot)
+    return stats_tot
+
+
 def run(args):
     """args  : Namespace (`argopt.DictAttrWrap` or from `argparse`)"""
     log.debug("parsing args")
@@ -443,87 +1328,86 @@ def run(args):
                             dirs.remove('.git')
             i += 1
 
-    exclude_files = None
-    include_files = None
-    if args.no_regex:
-        exclude_files = set(RE_CSPILT.split(args.excl))
-        include_files = set()
-        if args.incl == ".*":
-            args.incl = ""
-        else:
-            include_files.update(RE_CSPILT.split(args.incl))
-    else:
-        # cannot use findall in case of grouping:
-        # for i in include_files:
-        # for i in [include_files]:
-        #   for j in range(1, len(i)):
-        #     if i[j] == '(' and i[j - 1] != '\\':
-        #       raise ValueError('Parenthesis must be escaped'
-        #                        ' in include-files:\n\t' + i)
-        exclude_files = re.compile(args.excl) if args.excl else None
-        include_files = re.compile(args.incl)
-        # include_files = re.compile(args.incl, flags=re.M)
-
+    include_files, exclude_files = _file_filters(args.incl, args.excl, args.no_regex)
     cost = set(args.cost.lower().split(',')) if args.cost else set()
-    churn = set(args.loc.lower().split(',')) if args.loc else set()
-    if not churn:
-        if cost & COST_HOURS:
-            churn = CHURN_INS | CHURN_DEL
-        elif cost & COST_MONTHS:
-            churn = CHURN_INS
-        else:
-            churn = CHURN_SLOC
+    churn = _churn_type(args.loc, cost)
 
     if churn & (CHURN_INS | CHURN_DEL) and args.excl:
         log.warning("--loc=ins,del includes historical files"
                     " which may need to be added to --excl")
 
-    auth_stats = {}
-    statter = partial(_get_auth_stats, branch=args.branch, since=args.since, until=args.until,
-                      include_files=include_files, exclude_files=exclude_files, silent_progress=args.silent_progress,
-                      ignore_whitespace=args.ignore_whitespace, M=args.M, C=args.C, warn_binary=args.warn_binary,
-                      bytype=args.bytype, show=args.show, prefix_gitdir=len(gitdirs) > 1, churn=churn,
-                      ignore_rev=args.ignore_rev, ignore_revs_file=args.ignore_revs_file, jobs=args.jobs or None)
-
-    if len(gitdirs) > 1 and mapper is not map:
-        # concurrent multi-repo processing
-        _mapper = partial(mapper, desc="Repos", unit="repo", miniters=1, disable=args.silent_progress
-                          or len(gitdirs) <= 1)
-    else:
-        _mapper = map
-    for res in _mapper(statter, gitdirs):
-        for auth, stats in res.items():
-            if auth in auth_stats:
-                merge_stats(auth_stats[auth], stats)
-            else:
-                auth_stats[auth] = stats
+    # NB: `scheduler` (& thus any pending `checkpoint` writes) finishes first
+    with Profiler(args.profile) as profiler, \
+            Checkpoint(args.checkpoint) if args.checkpoint else nullcontext() as checkpoint, \
+            Scheduler(args.jobs or None, args.jobs_mode, max_jobs=args.max_jobs or None,
+                      max_memory=_size(args.max_memory) if args.max_memory else None) as scheduler:
+        profiler.jobs = scheduler.jobs
+        if args.timeline:
+            if not churn <= CHURN_SLOC:
+                raise ValueError("--timeline requires --loc=surviving")
+            from ._timeline import iter_timeline, timeline
+            with span("timeline", spec=args.timeline):
+                labels, values, totals = timeline(
+                    gitdirs, args.timeline, scheduler, sort=args.sort, since=args.since, until=args.until,
+                    branch=args.branch, include_files=include_files, exclude_files=exclude_files, show=args.show,
+                    silent_progress=args.silent_progress, ignore_whitespace=args.ignore_whitespace, M=args.M,
+                    C=args.C, warn_binary=args.warn_binary, ignore_rev=args.ignore_rev,
+                    ignore_revs_file=args.ignore_revs_file,
+                    cache_dir=None if args.no_cache else (args.cache_dir or default_cache_dir()))
+            with span("render", format=args.format):
+                print_unicode(iter_timeline(labels, values, totals, args.sort, args.format, args.enum, args.min))
+            return
 
-    stats_tot = {k: 0 for stats in auth_stats.values() for k in stats}
-    log.debug(stats_tot)
-    for k in stats_tot:
-        stats_tot[k] = sum(int_cast_or_len(stats.get(k, 0)) for stats in auth_stats.values())
-    log.debug(stats_tot)
+        auth_stats, stats_tot = _fame(
+            gitdirs, scheduler, on_file=_jsonl_writer(args.show) if args.format == 'jsonl' else None,
+            branch=args.branch, since=args.since, until=args.until, include_files=include_files,
+            exclude_files=exclude_files, silent_progress=args.silent_progress,
+            ignore_whitespace=args.ignore_whitespace, M=args.M, C=args.C, warn_binary=args.warn_binary,
+            bytype=args.bytype, show=args.show, churn=churn, ignore_rev=args.ignore_rev,
+            ignore_revs_file=args.ignore_revs_file,
+            cache_dir=None if args.no_cache else (args.cache_dir or default_cache_dir()),
+            incremental=args.incremental, shard=_shard(args.shard) if args.shard else None, checkpoint=checkpoint,
+            by_dir=args.by_dir)
 
-    # NOTE: future idea: show stats per file extension (or other grouping) in addition to per-author
-    # extns = set()
-    # if args.bytype:
-    #   for stats in auth_stats.values():
-    #     extns.update([fext(i) for i in stats["files"]])
-    # log.debug(extns)
+        with span("render", format=args.format):
+            print_unicode(
+                iter_tabulate(auth_stats, stats_tot, args.sort, args.bytype, args.format, cost, args.enum, args.min))
 
-    print_unicode(tabulate(auth_stats, stats_tot, args.sort, args.bytype, args.format, cost, args.enum, args.min))
 
+def _requested(argv, opt, short=None):
+    """
+    Whether `argv` may include `opt` (or `short`), conservatively accounting
+    for abbreviations & combined short options.
+    """
+    for arg in argv:
+        if arg == '--':
+            break
+        if arg.startswith('--'):
+            if opt.startswith(arg.partition('=')[0]):
+                return True
+        elif short and arg.startswith('-') and short in arg.partition('=')[0]:
+            return True
+    return False
 
-def get_main_parser():
-    import shtab
+
+def get_main_parser(argv=None):
+    """
+    argv  : list, if specified, only set up what's needed to parse it
+      (skipping e.g. shell completion & version detection unless requested).
+    """
     from argopt import argopt
-    parser = argopt(__doc__ + '\n' + __copyright__, version=__version__)
+    version = _version() if argv is None or _requested(argv, "--version", "v") else "UNKNOWN"
+    parser = argopt(__doc__ + '\n' + __copyright__, version=version)
+    if argv is None or _requested(argv, "--print-completion") or _requested(argv, "--help", "h"):
+        import shtab
+    else:
+        shtab = None
 
     def csv_permute(a, b):
         return a | b | {k for i in a for j in b for k in (f"{i},{j}", f"{j},{i}")}
 
     for o in parser._get_optional_actions():
-        if o.dest == 'branch':
+        if o.dest == 'branch' and shtab:
             try:
                 o.complete = shtab.cmd("git branch")
             except AttributeError:
@@ -532,13 +1416,17 @@ def get_main_parser():
             o.choices = 'loc', 'commits', 'files', 'hours', 'months'
             o.metavar = None
             o.help = "[default: loc]."
+        elif o.dest == 'jobs_mode':
+            o.choices = 'thread', 'process', 'async'
+            o.metavar = None
+            o.help = "[default: thread]."
         elif o.dest == 'loc':
             o.choices = CHURN_SLOC | csv_permute(CHURN_INS, CHURN_DEL)
         elif o.dest == 'cost':
             o.choices = csv_permute(COST_HOURS, COST_MONTHS)
         elif o.dest == 'show':
             o.choices = csv_permute(SHOW_NAME, SHOW_EMAIL)
-        elif o.dest == 'ignore_revs_file':
+        elif o.dest == 'ignore_revs_file' and shtab:
             try:
                 o.complete = shtab.glob("*git*rev*")
             except AttributeError:
@@ -551,13 +1439,22 @@ def get_main_parser():
             o.choices = 'FATAL', 'CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG', 'NOTSET'
             o.metavar = None
             o.help = "[default: INFO]."
-    shtab.add_argument_to(parser)
+    if shtab:
+        shtab.add_argument_to(parser)
     return parser
 
 
 def main(args=None):
     """args  : list [default: sys.argv[1:]]"""
-    parser = get_main_parser()
+    if args is None:
+        args = sys.argv[1:]
+    if args[:1] == ["serve"]:
+        from ._serve import main as serve
+        return serve(args[1:])
+    if args[:1] == ["merge"]:
+        from ._merge import main as merge
+        return merge(args[1:])
+    parser = get_main_parser(args)
     args = parser.parse_args(args=args)
     logging.basicConfig(level=getattr(logging, args.log, logging.INFO), stream=TqdmStream,
                         format="%(levelname)s:gitfame.%(funcName)s:%(lineno)d:%(message)s")
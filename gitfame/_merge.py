@@ -0,0 +1,75 @@
+r"""Usage:
+  merge [--help | options] [<partial>...]
+
+Combine partial results (from `git-fame --format=partial`, e.g. of different
+`--shard`s or repositories) and print them as per `git-fame`.
+
+Arguments:
+  <partial>      Partial result file [default: -] (`-` for stdin).
+
+Options:
+  -h, --help     Print this help and exit.
+  -v, --version  Print module version and exit.
+  --sort=<key>   [default: loc]|commits|files|hours|months.
+  --min=<val>    Minimum value (of `--sort` key) to show [default: 0:int].
+  --cost=<method>  Include time cost in person-months (COCOMO) or
+                   person-hours (based on commit times).
+                   Methods: month(s)|cocomo|hour(s)|commit(s).
+  --enum         Show row numbers [default: False].
+  --format=<format>  Table format [default: md] (as per `git-fame`).
+  --log=<lvl>    FATAL|CRITICAL|ERROR|WARN(ING)|[default: INFO]|DEBUG|NOTSET.
+"""
+import logging
+import sys
+
+from ._gitfame import FORMATS, __version__, _totals, iter_tabulate, load_partial
+from ._utils import PathTable, TqdmStream, merge_stats, print_unicode
+
+__author__ = "Casper da Costa-Luis <casper.dcl@physics.org>"
+__date__ = "2016-2026"
+__licence__ = "[MPLv2.0](https://mozilla.org/MPL/2.0/)"
+__all__ = ["merge", "main"]
+__copyright__ = ' '.join(("Copyright (c)", __date__, __author__, __licence__))
+__license__ = __licence__ # weird foreign language
+log = logging.getLogger(__name__)
+
+
+def merge(partials):
+    """
+    Combines `auth_stats` (as per `load_partial`) as per `merge_stats`,
+    in order of first appearance. Returns `(auth_stats, stats_tot)`.
+    """
+    auth_stats = {}
+    for partial in partials:
+        for auth, stats in partial.items():
+            if auth in auth_stats:
+                merge_stats(auth_stats[auth], stats)
+            else:
+                auth_stats[auth] = stats
+    return auth_stats, _totals(auth_stats)
+
+
+def _read(fname):
+    if fname == '-':
+        return sys.stdin.read()
+    with open(fname, encoding='utf-8') as fd:
+        return fd.read()
+
+
+def main(args=None):
+    """args  : list [default: sys.argv[2:]]"""
+    from argopt import argopt
+    parser = argopt(__doc__ + '\n' + __copyright__, version=__version__, prog="git-fame merge")
+    for o in parser._get_optional_actions():
+        if o.dest == 'sort':
+            o.choices = 'loc', 'commits', 'files', 'hours', 'months'
+        elif o.dest == 'format':
+            o.choices = FORMATS
+    args = parser.parse_args(args=args)
+    logging.basicConfig(level=getattr(logging, args.log, logging.INFO), stream=TqdmStream,
+                        format="%(levelname)s:gitfame.%(funcName)s:%(lineno)d:%(message)s")
+    fnames = args.partial if isinstance(args.partial, list) else [args.partial]
+    paths = PathTable()
+    auth_stats, stats_tot = merge(load_partial(_read(fname), paths) for fname in fnames or ['-'])
+    cost = set(args.cost.lower().split(',')) if args.cost else set()
+    print_unicode(iter_tabulate(auth_stats, stats_tot, args.sort, False, args.format, cost, args.enum, args.min))
@@ -0,0 +1,141 @@
+"""Per-phase timing & `git` subprocess instrumentation (`--profile`)"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+__author__ = "Casper da Costa-Luis <casper.dcl@physics.org>"
+__date__ = "2016-2026"
+__licence__ = "[MPLv2.0](https://mozilla.org/MPL/2.0/)"
+__all__ = ["Profiler", "span", "record", "metered", "active"]
+__copyright__ = ' '.join(("Copyright (c)", __date__, __author__, __licence__))
+__license__ = __licence__ # weird foreign language
+
+log = logging.getLogger(__name__)
+# number of slowest files to summarise
+TOP_FILES = 20
+# Chrome trace `tid`s of worker slots (distinct from real thread IDs)
+WORKER_TID = 1 << 24
+_active = None # current `Profiler`
+
+
+def active():
+    """Whether or not profiling is enabled"""
+    return _active is not None
+
+
+class Profiler:
+    """
+    Records timed events, saved to `fname` (if any) upon exit as Chrome trace
+    JSON (https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU)
+    plus a `"summary"` of phases, slowest files, & worker utilisation.
+    """
+    def __init__(self, fname=None):
+        self.fname = fname
+        self.jobs = None # number of worker slots (for utilisation)
+        self.t0 = time.perf_counter()
+        self.events = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        global _active
+        if self.fname:
+            self.t0 = time.perf_counter()
+            _active = self
+        return self
+
+    def __exit__(self, *_):
+        global _active
+        if _active is self:
+            _active = None
+            self.save(self.fname)
+
+    def add(self, name, cat, start, end, tid=None, **args):
+        event = {
+            "name": name, "cat": cat, "ph": "X", "ts": (start - self.t0) * 1e6, "dur": (end - start) * 1e6,
+            "pid": os.getpid(), "tid": threading.get_ident() if tid is None else tid, "args": args}
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self):
+        wall = time.perf_counter() - self.t0
+        phases = defaultdict(lambda: {"count": 0, "seconds": 0.0, "bytes": 0})
+        for event in self.events:
+            phase = phases[event["name"]]
+            phase["count"] += 1
+            phase["seconds"] += event["dur"] / 1e6
+            phase["bytes"] += event["args"].get("bytes", 0)
+            if "wait" in event["args"]: # streamed & parsed
+                phase["parse_seconds"] = phase.get("parse_seconds", 0) + event["dur"] / 1e6 - event["args"]["wait"]
+        tasks = [event for event in self.events if event["cat"] == "worker"]
+        slowest = sorted(tasks, key=lambda event: event["dur"], reverse=True)[:TOP_FILES]
+        res = {
+            "wall_seconds": wall, "phases": dict(phases),
+            "slowest": [{
+                "repo": event["args"].get("repo"), "file": event["args"].get("file"), "seconds": event["dur"] / 1e6,
+                "bytes": event["args"].get("bytes", 0)} for event in slowest]}
+        if tasks and self.jobs:
+            elapsed = (max(e["ts"] + e["dur"] for e in tasks) - min(e["ts"] for e in tasks)) / 1e6
+            busy = sum(e["dur"] for e in tasks) / 1e6
+            res["workers"] = {
+                "jobs": self.jobs, "busy_seconds": busy, "elapsed_seconds": elapsed,
+                "utilisation": busy / (self.jobs * elapsed) if elapsed else 1.0}
+        return res
+
+    def save(self, fname):
+        pid = os.getpid()
+        # name worker slots
+        meta = [{
+            "name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": f"worker {tid - WORKER_TID}"}}
+                for tid in sorted({event["tid"] for event in self.events if event["cat"] == "worker"})]
+        with open(fname, "w") as fd:
+            json.dump({"traceEvents": meta + self.events, "displayTimeUnit": "ms", "summary": self.summary()}, fd)
+        log.info("profile saved:%s", fname)
+
+
+@contextmanager
+def span(name, cat="phase", **args):
+    """
+    Time the enclosed block (if profiling).
+    Yields `args` (which may be updated, e.g. with `bytes`).
+    """
+    if (prof := _active) is None:
+        yield args
+        return
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        prof.add(name, cat, start, time.perf_counter(), **args)
+
+
+def record(name, cat, start, end, tid=None, **args):
+    """Record an externally timed event (if profiling)"""
+    if (prof := _active) is not None:
+        prof.add(name, cat, start, end, tid=tid, **args)
+
+
+def metered(lines, args):
+    """
+    Yields `lines`, accumulating `args["bytes"]` read and seconds spent
+    waiting for them (`args["wait"]`), if profiling.
+    """
+    if _active is None:
+        yield from lines
+        return
+    args.setdefault("bytes", 0)
+    args.setdefault("wait", 0.0)
+    lines = iter(lines)
+    while True:
+        start = time.perf_counter()
+        try:
+            line = next(lines)
+        except StopIteration:
+            args["wait"] += time.perf_counter() - start
+            return
+        args["wait"] += time.perf_counter() - start
+        args["bytes"] += len(line)
+        yield line
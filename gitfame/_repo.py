@@ -0,0 +1,96 @@
+"""Warm per-file `git blame` tallies of a repository, refreshed incrementally"""
+import logging
+from collections import namedtuple
+from os import path
+
+from ._gitfame import (RE_NCOM_AUTH_EM, SHOW_EMAIL, SHOW_NAME, _extend_stats, _file_groups, _filter_files,
+                       _get_auth_stats, _new_stats, _show_author, _touched_since)
+from ._utils import PathTable, check_output
+
+__author__ = "Casper da Costa-Luis <casper.dcl@physics.org>"
+__date__ = "2016-2026"
+__licence__ = "[MPLv2.0](https://mozilla.org/MPL/2.0/)"
+__all__ = ["Repo", "Snapshot"]
+__copyright__ = ' '.join(("Copyright (c)", __date__, __author__, __licence__))
+__license__ = __licence__ # weird foreign language
+log = logging.getLogger(__name__)
+# `tip`: commit (`None` before the first refresh),
+# `tallies`: `{fname: {"<name> <<email>>": {"loc": int, "ctimes": {int}}}}`,
+# `commits`: `{"<name> <<email>>": int}`
+Snapshot = namedtuple("Snapshot", ["tip", "tallies", "commits"])
+
+
+class Repo:
+    """
+    Warm per-file tallies of one `gitdir` (only ever replaced, never mutated),
+    of only `include_files` & not `exclude_files` (as per `_file_filters`).
+    """
+    def __init__(self, gitdir, branch="HEAD", since=None, until=None, include_files=None, exclude_files=None,
+                 **kwargs):
+        self.gitdir, self.branch, self.since, self.until = gitdir, branch, since, until
+        self.include_files, self.exclude_files = include_files, exclude_files
+        self.kwargs = kwargs # for `_get_auth_stats`
+        # replaced as a whole so that concurrent readers see a consistent state
+        self.snapshot = Snapshot(None, {}, {})
+
+    @property
+    def tip(self):
+        return self.snapshot.tip
+
+    @property
+    def tallies(self):
+        return self.snapshot.tallies
+
+    @property
+    def commits(self):
+        return self.snapshot.commits
+
+    def refresh(self, scheduler):
+        """Re-process files changed since the last refresh. Returns whether the tip moved"""
+        git_cmd = ["git", "-C", self.gitdir]
+        tip = check_output(git_cmd + ["rev-parse", "--verify", "-q", f"{self.branch}^{{commit}}"]).strip()
+        old = self.snapshot
+        if tip == old.tip:
+            return False
+        changed = None if old.tip is None else _touched_since(git_cmd, old.tip, tip)
+        log.debug("refresh:%s:%s..%s:%s changed files", self.gitdir, old.tip, tip,
+                  "all" if changed is None else len(changed))
+        tallies = {} if changed is None else {f: t for f, t in old.tallies.items() if f not in changed}
+        include_files = self.include_files
+        if changed is not None:
+            include_files = set(_filter_files(changed, include_files, self.exclude_files))
+        if changed is None or include_files:
+            # deleted (or now binary) files are never passed to `on_file`
+            stats = _get_auth_stats(
+                self.gitdir, branch=tip, since=self.since, until=self.until, include_files=include_files,
+                exclude_files=self.exclude_files, silent_progress=True, show=SHOW_NAME | SHOW_EMAIL,
+                scheduler=scheduler, on_file=lambda _, fname, tally: tallies.__setitem__(fname, tally), **self.kwargs)
+            commits = {auth: s["commits"] for auth, s in stats.items() if s["commits"]}
+        else: # e.g. merge or empty commits
+            since = ["--since", self.since] if self.since else []
+            until = ["--until", self.until] if self.until else []
+            with scheduler.slot():
+                out = check_output(git_cmd + ["shortlog", "-s", "-e", tip] + since + until)
+            commits = {f'{name} <{em}>': int(ncom) for ncom, name, em in RE_NCOM_AUTH_EM.findall(out.strip())}
+        # `git ls-tree` order
+        self.snapshot = Snapshot(tip, dict(sorted(tallies.items())), commits)
+        return True
+
+    def auth_stats(self, include_files=None, exclude_files=None, show=SHOW_NAME, bytype=False, prefix_gitdir=False,
+                   paths=None, by_dir=0):
+        """Returns `auth_stats` as per `_get_auth_stats` (without running `git`)"""
+        _, tallies, commits = self.snapshot
+        paths = PathTable() if paths is None else paths
+        auth_stats = {}
+        shown = {} # `{"<name> <<email>>": name and/or email}`
+        for fname in _filter_files(tallies, include_files, exclude_files):
+            fid = paths.intern(path.join(self.gitdir, fname) if prefix_gitdir else fname)
+            groups = _file_groups(fname, bytype, by_dir, self.gitdir if prefix_gitdir else None)
+            for auth, stats in tallies[fname].items():
+                if auth not in shown:
+                    shown[auth] = _show_author(auth, show)
+                _extend_stats(auth_stats, paths, fid, shown[auth], stats["loc"], stats["ctimes"], groups)
+        for auth, ncom in commits.items():
+            auth = shown.get(auth) or _show_author(auth, show)
+            auth_stats.setdefault(auth, _new_stats(paths))["commits"] += ncom
+        return auth_stats
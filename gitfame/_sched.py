@@ -0,0 +1,243 @@
+"""Bounded largest-first task scheduler shared across repositories"""
+import heapq
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from itertools import count
+
+from . import _profile
+
+__author__ = "Casper da Costa-Luis <casper.dcl@physics.org>"
+__date__ = "2016-2026"
+__licence__ = "[MPLv2.0](https://mozilla.org/MPL/2.0/)"
+__all__ = ["Scheduler", "Tuner"]
+__copyright__ = ' '.join(("Copyright (c)", __date__, __author__, __licence__))
+__license__ = __licence__ # weird foreign language
+
+log = logging.getLogger(__name__)
+# subprocesses are cheap to keep in flight when not each tied to a thread
+ASYNC_JOBS = 256
+# minimum seconds between `Tuner` decisions
+TUNE_INTERVAL = 0.5
+# relative throughput change considered significant
+TUNE_TOLERANCE = 0.05
+# fraction of system memory below which to back off
+LOW_MEMORY = 0.1
+# fixed cost of each task (e.g. spawning `git`) in bytes-equivalent, so that
+# throughput doesn't appear to drop as (largest-first) task sizes decrease
+TASK_BYTES = 1 << 14
+
+
+def _memory():
+    """
+    Returns `(available, total, peak)` bytes of system memory & the peak
+    resident memory of any (finished) child process, each `None` if unknown.
+    """
+    available = total = peak = None
+    try:
+        with open("/proc/meminfo") as fd:
+            info = {k: int(v.split()[0]) * 1024 for k, _, v in (line.partition(':') for line in fd)}
+        available, total = info.get("MemAvailable"), info.get("MemTotal")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError: # pragma: no cover
+        pass
+    else:
+        # bytes on macOS, KiB elsewhere
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return available, total, peak or None
+
+
+class Tuner:
+    """
+    Adapts the number of concurrent tasks (`limit`) within `[1, max_jobs]`.
+
+    Hill-climbs on observed throughput (`TASK_BYTES` + task bytes per second),
+    doubling while it improves & then stepping by a quarter (reversing
+    direction whenever it drops). Halves upon memory pressure: low system
+    memory, or if `limit` children of the largest size seen so far would exceed
+    `max_memory` bytes.
+    """
+    def __init__(self, max_jobs, start=None, max_memory=None, interval=TUNE_INTERVAL, memory=_memory,
+                 clock=time.perf_counter):
+        self.max_jobs, self.max_memory, self.interval = max_jobs, max_memory, interval
+        self.limit = min(max_jobs, start or max_jobs)
+        self._memory, self._clock = memory, clock
+        self._tput = None # of the previous window
+        self._growing, self._direction = True, 1
+        self._reset()
+
+    def _reset(self):
+        self._start, self._bytes, self._tasks, self._latency = self._clock(), 0, 0, 0.0
+
+    def record(self, size, latency):
+        """Account for a finished task of `size` bytes. Returns the (new) `limit`"""
+        self._bytes += TASK_BYTES + size
+        self._tasks += 1
+        self._latency += latency
+        if (elapsed := self._clock() - self._start) < self.interval or self._tasks < self.limit:
+            return self.limit
+
+        tput = self._bytes / elapsed if elapsed else 0
+        old, cap = self.limit, self.max_jobs
+        available, total, peak = self._memory()
+        if self.max_memory and peak:
+            cap = min(cap, max(1, self.max_memory // peak))
+        if (available is not None and ((total and available < total * LOW_MEMORY) or (peak and available < peak))
+                or old > cap):
+            self._growing = False
+            new, why = min(old // 2, cap), "memory pressure"
+        elif self._tput is None or tput > self._tput * (1 + TUNE_TOLERANCE):
+            new = old * 2 if self._growing else old + self._direction * max(1, old // 4)
+            why = "throughput up"
+        elif tput < self._tput * (1 - TUNE_TOLERANCE):
+            self._growing, self._direction = False, -self._direction
+            new, why = old + self._direction * max(1, old // 4), "throughput down"
+        else:
+            new, why = old, "throughput steady"
+        self.limit = max(1, min(new, cap))
+        if self.limit != old:
+            log.debug("jobs:%d->%d:%s (%.3g MB/s, %.3gs/task, available memory:%s, peak child memory:%s)", old,
+                      self.limit, why, tput / 1e6, self._latency / self._tasks,
+                      "?" if available is None else f"{available / 1e6:.0f}MB",
+                      "?" if peak is None else f"{peak / 1e6:.0f}MB")
+        self._tput = tput
+        self._reset()
+        return self.limit
+
+
+class Scheduler:
+    """
+    Runs at most `jobs` tasks at once, largest first, in a thread or process
+    (`mode`) pool. A single instance is shared by all repositories so that
+    `--jobs` is a global limit.
+
+    In "async" `mode`, tasks are coroutine functions run on `loop`
+    [default: a new event loop in a background thread].
+
+    If `jobs` is not specified, a `Tuner` adapts the number of concurrent tasks
+    (`limit`) at runtime, up to `max_jobs` [default: depends on `mode`] and
+    subject to `max_memory` (bytes).
+
+    Work run in the calling thread (e.g. other `git` processes) may also
+    count towards `limit` by holding a `slot`.
+    """
+    def __init__(self, jobs=None, mode="thread", loop=None, max_jobs=None, max_memory=None):
+        self.tuner = None
+        if not jobs:
+            jobs = max_jobs or {"process": os.cpu_count() or 1, "async": ASYNC_JOBS}.get(
+                mode, min(32, (os.cpu_count() or 1) + 4))
+            self.tuner = Tuner(jobs, os.cpu_count(), max_memory)
+        self.jobs = jobs # maximum
+        self.limit = self.tuner.limit if self.tuner else jobs # current
+        self.mode = mode
+        self.executor, self.loop, self._loop_thread = None, loop, None
+        # NB: `asyncio` & `multiprocessing` are only imported if needed (slow)
+        if mode == "process":
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=jobs)
+        elif mode != "async":
+            self.executor = ThreadPoolExecutor(max_workers=jobs)
+        elif loop is None:
+            import asyncio
+            self.loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(target=self.loop.run_forever, name="gitfame-async", daemon=True)
+            self._loop_thread.start()
+        self._queue = [] # heap of `(-size, seq, future, func, args, trace)`
+        self._seq = count()
+        self._running = 0
+        self._waiting = 0 # for a `slot` (which take precedence over queued tasks)
+        self._closed = False
+        self._slots = list(range(jobs))[::-1] # free worker slots (for `--profile`)
+        self._lock = threading.RLock()
+        self._freed = threading.Condition(self._lock)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.shutdown()
+
+    def shutdown(self):
+        """Cancel queued tasks & wait for running ones"""
+        with self._lock:
+            self._closed = True
+            queued, self._queue = self._queue, []
+            self._freed.notify_all()
+        for _, _, fut, *_ in queued:
+            fut.cancel()
+        if self.executor is not None:
+            self.executor.shutdown()
+        if self._loop_thread is not None: # own loop
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._loop_thread.join()
+            self.loop.close()
+            self._loop_thread = None
+
+    def submit(self, size, func, *args, trace=None):
+        """
+        Queue `func(*args)`, prioritising larger `size`. Returns a `Future`.
+
+        trace  : dict, `--profile` event `args` (including `"name"`).
+        """
+        fut = Future()
+        with self._lock:
+            heapq.heappush(self._queue, (-size, next(self._seq), fut, func, args, trace))
+        self._dispatch()
+        return fut
+
+    @contextmanager
+    def slot(self):
+        """Blocks until fewer than `limit` tasks (or slots) are running, & holds a slot"""
+        with self._lock:
+            self._waiting += 1
+            try:
+                while self._running >= self.limit and not self._closed:
+                    self._freed.wait()
+            finally:
+                self._waiting -= 1
+            self._running += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._freed.notify_all()
+            self._dispatch()
+
+    def _dispatch(self):
+        with self._lock:
+            while self._running + self._waiting < self.limit and self._queue and not self._closed:
+                size, _, fut, func, args, trace = heapq.heappop(self._queue)
+                if fut.set_running_or_notify_cancel():
+                    self._running += 1
+                    slot, start = self._slots.pop(), time.perf_counter()
+                    if self.executor is None:
+                        from asyncio import run_coroutine_threadsafe
+                        res = run_coroutine_threadsafe(func(*args), self.loop)
+                    else:
+                        res = self.executor.submit(func, *args)
+                    res.add_done_callback(partial(self._done, fut, slot, start, -size, trace))
+
+    def _done(self, fut, slot, start, size, trace, res):
+        trace = dict(trace or {})
+        end = time.perf_counter()
+        _profile.record(trace.pop("name", "task"), "worker", start, end, tid=_profile.WORKER_TID + slot, **trace)
+        with self._lock:
+            self._running -= 1
+            self._slots.append(slot)
+            if self.tuner is not None:
+                self.limit = self.tuner.record(size, end - start)
+            self._freed.notify_all()
+        try:
+            fut.set_result(res.result())
+        except BaseException as exc:
+            fut.set_exception(exc)
+        self._dispatch()
@@ -0,0 +1,239 @@
+r"""Usage:
+  serve [--help | options] [<gitdir>...]
+
+Keep per-file `git blame` tallies of <gitdir>s in memory, refreshing them
+(only re-processing changed files) whenever a branch tip moves, and serve
+queries over HTTP without re-running `git`:
+
+  GET /?incl=<f>&excl=<f>&no-regex&show=<info>&sort=<key>&min=<val>
+       &format=<format>&cost=<method>&bytype&by-dir=<n>&enum&repo=<gitdir>
+       Table (as per `git-fame`). `repo` may be repeated [default: all].
+  GET /status    Served repositories, their tips & number of files (JSON).
+  POST /refresh  Check for moved tips immediately.
+
+Arguments:
+  <gitdir>       Git directory [default: ./].
+
+Options:
+  -h, --help     Print this help and exit.
+  -v, --version  Print module version and exit.
+  --bind=<addr>  [<host>:]<port> (HTTP, host defaulting to 127.0.0.1),
+                 or the path of a Unix socket [default: 8080].
+  --interval=<s>  Seconds between checks for moved branch tips
+                  [default: 10:float]. Use 0 to only refresh upon request.
+  --branch=<b>   Branch or tag [default: HEAD] up to which to check.
+  --since=<date>  Date from which to check.
+  --until=<date>  Date to which to check.
+  -j=<n>, --jobs=<n>  Number of concurrent `git blame` jobs [default: 0:int].
+  --jobs-mode=<m>  [default: thread]|process|async.
+  --warn-binary  Don't silently skip binary files [default: False].
+  -w, --ignore-whitespace  Ignore whitespace [default: False].
+  -M             Detect intra-file line moves and copies [default: False].
+  -C             Detect inter-file line moves and copies [default: False].
+  --ignore-rev=<rev>       Ignore changes made by the given revision.
+  --ignore-revs-file=<f>   Ignore revisions listed in the given file.
+  --no-cache     Don't read or write the on-disk `git blame` cache
+                 [default: False].
+  --cache-dir=<d>  Cache directory (default: $XDG_CACHE_HOME/git-fame).
+  --log=<lvl>    FATAL|CRITICAL|ERROR|WARN(ING)|[default: INFO]|DEBUG|NOTSET.
+"""
+import json
+import logging
+import os
+import re
+import socket
+import socketserver
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from ._cache import default_cache_dir
+from ._gitfame import __version__, _file_filters, _totals, tabulate
+from ._repo import Repo
+from ._sched import Scheduler
+from ._utils import PathTable, TqdmStream, merge_stats
+
+__author__ = "Casper da Costa-Luis <casper.dcl@physics.org>"
+__date__ = "2016-2026"
+__licence__ = "[MPLv2.0](https://mozilla.org/MPL/2.0/)"
+__all__ = ["Server", "serve", "main"]
+__copyright__ = ' '.join(("Copyright (c)", __date__, __author__, __licence__))
+__license__ = __licence__ # weird foreign language
+log = logging.getLogger(__name__)
+
+
+class Server:
+    """
+    Warm `Repo`s, refreshed every `interval` seconds (if non-zero) once
+    `start`ed, answering `query`s.
+    """
+    def __init__(self, gitdirs, interval=10, jobs=None, jobs_mode="thread", **kwargs):
+        self.repos = {gitdir: Repo(gitdir, **kwargs) for gitdir in dict.fromkeys(gitdirs or ["."])}
+        self.interval = interval
+        self.scheduler = Scheduler(jobs, jobs_mode)
+        self._lock = threading.Lock() # one refresh at a time
+        self._stop = threading.Event()
+        self._poller = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *_):
+        self.close()
+
+    def start(self):
+        self.refresh()
+        if self.interval:
+            self._poller = threading.Thread(target=self._poll, name="gitfame-serve-poll", daemon=True)
+            self._poller.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join()
+        self.scheduler.shutdown()
+
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as exc:
+                log.warning("refresh failed:%s", exc)
+
+    def refresh(self):
+        """Returns `{gitdir: whether its tip moved}`"""
+        with self._lock, ThreadPoolExecutor(max_workers=self.scheduler.jobs) as pool:
+            moved = dict(zip(self.repos, pool.map(lambda repo: repo.refresh(self.scheduler), self.repos.values())))
+        if any(moved.values()):
+            log.info("refreshed:%s", ','.join(gitdir for gitdir, i in moved.items() if i))
+        return moved
+
+    def status(self):
+        return {gitdir: {"branch": repo.branch, "tip": snapshot.tip, "files": len(snapshot.tallies)}
+                for gitdir, repo in self.repos.items() for snapshot in [repo.snapshot]}
+
+    def query(self, repos=None, incl=".*", excl="", no_regex=False, show="name", sort="loc", min=0, format="md",
+              cost="", bytype=False, enum=False, by_dir=0):
+        """
+        Returns a table (as per `tabulate`) of the given `repos`
+        [default: all], with options as per the command-line ones.
+        """
+        if unknown := set(repos or []).difference(self.repos):
+            raise KeyError(f"not served:{','.join(sorted(unknown))}")
+        repos = [self.repos[gitdir] for gitdir in (repos or self.repos)]
+        include_files, exclude_files = _file_filters(incl or ".*", excl or "", no_regex)
+        show = set(show.lower().split(','))
+        auth_stats = {}
+        paths = PathTable()
+        for repo in repos:
+            for auth, stats in repo.auth_stats(include_files, exclude_files, show, bytype, len(repos) > 1, paths,
+                                               by_dir).items():
+                if auth in auth_stats:
+                    merge_stats(auth_stats[auth], stats)
+                else:
+                    auth_stats[auth] = stats
+        cost = set(cost.lower().split(',')) if cost else set()
+        return tabulate(auth_stats, _totals(auth_stats), sort, bytype, format, cost, enum, min)
+
+
+def _flag(params, key):
+    return bool(vals := params.get(key)) and vals[-1].lower() not in ("0", "false", "no")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = f"git-fame/{__version__}"
+
+    def _reply(self, code, body, content_type="text/plain"):
+        body = body.encode('utf-8')
+        self.send_response(code)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        fame = self.server.fame
+        if url.path == "/status":
+            return self._reply(200, json.dumps(fame.status()), "application/json")
+        if url.path != "/":
+            return self._reply(404, f"not found:{url.path}\n")
+        params = parse_qs(url.query, keep_blank_values=True)
+        try:
+            fmt = params.get("format", ["md"])[-1]
+            res = fame.query(
+                params.get("repo"), incl=params.get("incl", [".*"])[-1], excl=params.get("excl", [""])[-1],
+                no_regex=_flag(params, "no-regex"), show=params.get("show", ["name"])[-1],
+                sort=params.get("sort", ["loc"])[-1], min=int(params.get("min", ["0"])[-1]), format=fmt,
+                cost=params.get("cost", [""])[-1], bytype=_flag(params, "bytype"), enum=_flag(params, "enum"),
+                by_dir=int(params.get("by-dir", ["0"])[-1]))
+        except (KeyError, ValueError, RuntimeError, re.error) as exc:
+            return self._reply(400, f"{exc}\n")
+        self._reply(200, res + '\n', "application/json" if fmt in ("json", "jsonl", "partial") else "text/plain")
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/refresh":
+            return self._reply(404, f"not found:{self.path}\n")
+        try:
+            self.server.fame.refresh()
+        except Exception as exc:
+            return self._reply(500, f"{exc}\n")
+        self._reply(200, json.dumps(self.server.fame.status()), "application/json")
+
+    def address_string(self):
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, fmt, *args):
+        log.debug("%s:" + fmt, self.address_string(), *args)
+
+
+if hasattr(socket, "AF_UNIX"):
+    class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+else: # pragma: no cover
+    _UnixHTTPServer = None
+
+
+def serve(fame, bind="8080"):
+    """
+    Returns an (unstarted) HTTP server answering queries from `fame`
+    (a `Server`) on `bind` ([<host>:]<port>, or the path of a Unix socket).
+    """
+    host, _, port = bind.rpartition(':')
+    if port.isdigit():
+        httpd = ThreadingHTTPServer((host or "127.0.0.1", int(port)), _Handler)
+    elif _UnixHTTPServer is None: # pragma: no cover
+        raise ValueError(f"Unix sockets are not supported:{bind}")
+    else:
+        httpd = _UnixHTTPServer(bind, _Handler)
+    httpd.fame = fame
+    return httpd
+
+
+def main(args=None):
+    """args  : list [default: sys.argv[2:]]"""
+    from argopt import argopt
+    parser = argopt(__doc__ + '\n' + __copyright__, version=__version__, prog="git-fame serve")
+    for o in parser._get_optional_actions():
+        if o.dest == 'jobs_mode':
+            o.choices = 'thread', 'process', 'async'
+    args = parser.parse_args(args=args)
+    logging.basicConfig(level=getattr(logging, args.log, logging.INFO), stream=TqdmStream,
+                        format="%(levelname)s:gitfame.%(funcName)s:%(lineno)d:%(message)s")
+    gitdirs = args.gitdir if isinstance(args.gitdir, list) else [args.gitdir]
+    with Server(gitdirs, args.interval, args.jobs or None, args.jobs_mode, branch=args.branch, since=args.since,
+                until=args.until, warn_binary=args.warn_binary, ignore_whitespace=args.ignore_whitespace, M=args.M,
+                C=args.C, ignore_rev=args.ignore_rev, ignore_revs_file=args.ignore_revs_file,
+                cache_dir=None if args.no_cache else (args.cache_dir or default_cache_dir())) as fame:
+        httpd = serve(fame, args.bind)
+        log.info("serving:%s:%s", args.bind, ','.join(fame.repos))
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            httpd.server_close()
+            if isinstance(httpd, socketserver.UnixStreamServer):
+                os.unlink(args.bind)
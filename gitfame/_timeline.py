@@ -0,0 +1,188 @@
+"""Per-author statistics at multiple points in time (`--timeline`)"""
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ._gitfame import SHOW_NAME, _iter_structured, _tabber, hours, table2svg
+from ._profile import span
+from ._repo import Repo
+from ._utils import check_output, int_cast_or_len, merge_stats, tqdm
+
+__author__ = "Casper da Costa-Luis <casper.dcl@physics.org>"
+__date__ = "2016-2026"
+__licence__ = "[MPLv2.0](https://mozilla.org/MPL/2.0/)"
+__all__ = ["sample_times", "timeline", "iter_timeline"]
+__copyright__ = ' '.join(("Copyright (c)", __date__, __author__, __licence__))
+__license__ = __licence__ # weird foreign language
+log = logging.getLogger(__name__)
+
+RE_INTERVAL = re.compile(r"^(\d+)[. _]?(second|minute|hour|day|week|month|year)s?$", flags=re.I)
+INTERVALS = {
+    "second": 1, "minute": 60, "hour": 3600, "day": 86400, "week": 7 * 86400, "month": 30.44 * 86400,
+    "year": 365.25 * 86400}
+
+
+def _first_parents(gitdir, rev, since=None, until=None):
+    """`[(sha, committer_time), ...]` along `rev`'s first parents (newest first)"""
+    since = ["--since", since] if since else []
+    until = ["--until", until] if until else []
+    out = check_output(["git", "-C", gitdir, "log", "--first-parent", "--format=%H %ct"] + since + until + [rev])
+    return [(sha, int(tstamp)) for sha, tstamp in (line.split() for line in out.splitlines())]
+
+
+def _listed_commits(gitdir, spec, since=None, until=None):
+    """
+    `[(committer_time, sha), ...]` (ascending) of `git rev-list --no-walk`
+    args `spec` (e.g. "--tags" or "v1.0..HEAD") within `since`/`until`,
+    or `None` if `spec` is <n> or <interval> (as per `sample_times`).
+    """
+    if spec.isdigit() or RE_INTERVAL.match(spec):
+        return None
+    out = check_output(["git", "-C", gitdir, "rev-list", "--no-walk", "--first-parent", "--format=%ct %H",
+                        "--no-commit-header"] +
+                       (["--since", since] if since else []) + (["--until", until] if until else []) +
+                       spec.split())
+    if not (res := sorted({(int(tstamp), sha) for tstamp, sha in (line.split() for line in out.splitlines())})):
+        raise ValueError(f"--timeline={spec}: no commits")
+    return res
+
+
+def sample_times(gitdir, spec, branch="HEAD", since=None, until=None):
+    """
+    Returns ascending times (in seconds) at which to sample, as per `spec`:
+    <n> (evenly spaced), <interval> (e.g. "1.week", going back from the
+    latest commit), or `git rev-list --no-walk` args (their commits' times,
+    e.g. "--tags" or "v1.0..HEAD").
+    Only commits of `branch` (or of `spec`, if rev-list args) within
+    `since`/`until` are considered.
+    """
+    if (listed := _listed_commits(gitdir, spec, since, until)) is not None:
+        return sorted({tstamp for tstamp, _ in listed})
+    if not (commits := _first_parents(gitdir, branch, since, until)):
+        raise ValueError(f"--timeline={spec}: no commits")
+    start, end = min(t for _, t in commits), max(t for _, t in commits)
+    if spec.isdigit():
+        if (num := int(spec)) < 2:
+            return [end]
+        return [round(start + (end-start) * i / (num-1)) for i in range(num)]
+    num, unit = RE_INTERVAL.match(spec).groups()
+    if (step := int(num) * INTERVALS[unit.lower()]) <= 0:
+        raise ValueError(f"--timeline={spec}: interval must be positive")
+    res = []
+    while end >= start:
+        res.append(round(end))
+        end -= step
+    return res[::-1]
+
+
+def _labels(times):
+    """Dates (or times, if needed to be unique) of `times`"""
+    for fmt in ("%Y-%m-%d", "%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S"):
+        if len(labels := [time.strftime(fmt, time.gmtime(t)) for t in times]) == len(set(labels)):
+            break
+    return labels
+
+
+def _value(stats, key):
+    """`key` (loc|commits|files|hours|months) of an author's `stats`"""
+    if key == "hours":
+        return hours(stats["ctimes"])
+    if key == "months":
+        return 3.2 * (stats["loc"] / 1e3)**1.05
+    return int_cast_or_len(stats.get(key, 0))
+
+
+def _repo_timeline(gitdir, times, scheduler, branch="HEAD", include_files=None, exclude_files=None, show=None,
+                   prefix_gitdir=False, silent_progress=False, shas=None, **kwargs):
+    """
+    Returns `auth_stats` (as per `_get_auth_stats`) at each of `times`,
+    i.e. of the latest first-parent commit of `branch` at that time
+    (or of the corresponding commit in `shas`, if given).
+    """
+    with scheduler.slot():
+        commits = [] if shas else _first_parents(gitdir, branch)
+    repo = Repo(gitdir, include_files=include_files, exclude_files=exclude_files, **kwargs)
+    res = []
+    for i, tstamp in enumerate(tqdm(times, desc=gitdir if prefix_gitdir else "Sampling", unit="point",
+                                    disable=silent_progress)):
+        if shas:
+            sha = shas[i]
+        elif (sha := next((sha for sha, t in commits if t <= tstamp), None)) is None: # latest commit at `tstamp`
+            res.append({})
+            continue
+        repo.branch = sha
+        with span("timeline-point", repo=gitdir, commit=sha):
+            repo.refresh(scheduler)
+        res.append(repo.auth_stats(show=show or SHOW_NAME, prefix_gitdir=prefix_gitdir))
+    return res
+
+
+def timeline(gitdirs, spec, scheduler, sort="loc", since=None, until=None, **kwargs):
+    """
+    Returns `(labels, {"<author>": [value, ...]}, [total, ...])` of `sort`
+    (loc|commits|files|hours|months) at each point in time (as per
+    `sample_times(gitdirs[0], spec, ...)`). If `spec` is rev-list args, the
+    listed commits of `gitdirs[0]` themselves are used (& other `gitdirs`
+    are sampled at their times).
+    Files unchanged since the previous point are not blamed again.
+
+    kwargs  : passed to `Repo` (e.g. `branch`, `include_files`, `show`, `cache_dir`).
+    """
+    if (listed := _listed_commits(gitdirs[0], spec, since, until)) is not None:
+        times, shas = [tstamp for tstamp, _ in listed], [sha for _, sha in listed]
+    else:
+        times, shas = sample_times(gitdirs[0], spec, kwargs.get("branch", "HEAD"), since, until), None
+    log.debug("timeline:%d points", len(times))
+    with ThreadPoolExecutor(max_workers=scheduler.jobs if len(gitdirs) > 1 else 1) as repos:
+        per_repo = list(repos.map(
+            lambda gitdir: _repo_timeline(gitdir, times, scheduler, prefix_gitdir=len(gitdirs) > 1,
+                                          shas=shas if gitdir == gitdirs[0] else None, **kwargs),
+            gitdirs))
+    values, totals = {}, []
+    for i, points in enumerate(zip(*per_repo)):
+        auth_stats = {}
+        for stats in points:
+            for auth, s in stats.items():
+                if auth in auth_stats:
+                    merge_stats(auth_stats[auth], s)
+                else:
+                    auth_stats[auth] = s
+        point = {auth: _value(stats, sort) for auth, stats in auth_stats.items()}
+        for auth, val in point.items():
+            values.setdefault(auth, [0] * len(times))[i] = val
+        totals.append(sum(point.values())) # as per `tabulate`
+    return _labels(times), values, totals
+
+
+def iter_timeline(labels, values, totals, sort="loc", backend="md", row_nums=False, min_sort_val=0):
+    """
+    Yields chunks of a table of authors (sorted by their latest `values`)
+    by `labels`.
+    """
+    tab = sorted(([auth] + vals for auth, vals in values.items() if max(vals) >= min_sort_val),
+                 key=lambda row: row[-1], reverse=True)
+    tab = [row[:1] + [round(i, 1) if isinstance(i, float) else i for i in row[1:]] for row in tab]
+    totals = [round(i, 1) if isinstance(i, float) else i for i in totals]
+    cols = ["Author"] + labels
+    if row_nums:
+        tab = [[i] + row for i, row in enumerate(tab, 1)]
+        cols.insert(0, '#')
+    if (backend := backend.lower()) in ("tabulate", "md", "markdown"):
+        backend = "pipe"
+    elif backend == "jsonl":
+        backend = "json"
+    if backend in ("yaml", "yml", "json", "csv", "tsv"):
+        yield from _iter_structured({"total": dict(zip(labels, totals)), "data": tab, "columns": cols}, backend)
+        return
+    if svg := backend.startswith("svg"):
+        backend = backend[3:].lstrip('-') or 'fame'
+    if backend not in (tabber := _tabber())._table_formats:
+        raise ValueError(f"Unknown backend:{backend}")
+    table = tabber.tabulate(tab + [([""] if row_nums else []) + ["Total"] + totals], cols, tablefmt=backend,
+                            floatfmt='.1f')
+    if svg:
+        yield table2svg(table, backend)
+    else:
+        yield f"Timeline of {sort}\n"
+        yield table
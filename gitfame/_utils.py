@@ -1,50 +1,78 @@
+import codecs
 import logging
+import os
 import subprocess
 import sys
-from functools import partial
-
-from tqdm import tqdm as tqdm_std
-from tqdm.utils import _screen_shape_wrapper
-
-try:
-    from threading import RLock
-except ImportError:
-    tqdm = tqdm_std
-else:
-    tqdm_std.set_lock(RLock())
-    tqdm = partial(tqdm_std, lock_args=(False,))
-
-try:
-    from concurrent.futures import ThreadPoolExecutor  # noqa: F401, yapf: disable
-
-    from tqdm.contrib.concurrent import thread_map
-    mapper = partial(thread_map, tqdm_class=tqdm_std)
-except ImportError:
-    mapper = map
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, MutableSet
+from functools import lru_cache
+from threading import Lock, RLock
 
 __author__ = "Casper da Costa-Luis <casper.dcl@physics.org>"
 __date__ = "2016-2025"
 __licence__ = "[MPLv2.0](https://mozilla.org/MPL/2.0/)"
-__all__ = ["TERM_WIDTH", "int_cast_or_len", "Max", "fext", "tqdm", "check_output", "print_unicode", "Str", "mapper"]
+__all__ = [
+    "TERM_WIDTH", "int_cast_or_len", "Max", "fext", "fdir", "tqdm", "check_output", "iter_output", "print_unicode",
+    "Str"]
 __copyright__ = ' '.join(("Copyright (c)", __date__, __author__, __licence__))
 __license__ = __licence__ # weird foreign language
 
 log = logging.getLogger(__name__)
-if not (TERM_WIDTH := _screen_shape_wrapper()(sys.stdout)[0]):
+try:
+    TERM_WIDTH = os.get_terminal_size(sys.stdout.fileno()).columns
+except (AttributeError, ValueError, OSError):
+    TERM_WIDTH = 0
+if not TERM_WIDTH:
     # non interactive pipe
     TERM_WIDTH = 256
 
 
+@lru_cache(maxsize=None)
+def _tqdm_std():
+    """`tqdm.tqdm`, imported upon first use (for faster startup)"""
+    from tqdm import tqdm as tqdm_std
+    tqdm_std.set_lock(RLock())
+    return tqdm_std
+
+
+def tqdm(iterable=None, disable=False, **kwargs):
+    """`tqdm.tqdm` (sharing a thread-safe lock), or `iterable` if `disable`d"""
+    if disable:
+        return iterable
+    return _tqdm_std()(iterable, lock_args=(False,), **kwargs)
+
+
 class TqdmStream:
     @classmethod
     def write(cls, msg):
-        tqdm_std.write(msg, end='')
+        if "tqdm" in sys.modules: # may have bars to avoid clobbering
+            _tqdm_std().write(msg, end='')
+        else:
+            sys.stdout.write(msg)
+
+
+def check_output(*a, input=None, **k):
+    log.debug(' '.join(a[0][3:]))
+    k.setdefault('stdout', subprocess.PIPE)
+    return subprocess.Popen(*a, **k).communicate(input)[0].decode('utf-8', errors='replace') # nosec B603
 
 
-def check_output(*a, **k):
+def iter_output(*a, **k):
+    """
+    Like `check_output`, but yields lines as they are written
+    (rather than buffering the whole output).
+    Only `\n` ends a line (e.g. a lone `\r` in blamed content does not).
+    Raises `CalledProcessError` upon non-zero exit.
+    """
+    from io import TextIOWrapper
     log.debug(' '.join(a[0][3:]))
     k.setdefault('stdout', subprocess.PIPE)
-    return subprocess.Popen(*a, **k).communicate()[0].decode('utf-8', errors='replace') # nosec B603
+    with subprocess.Popen(*a, **k) as proc, TextIOWrapper( # nosec B603
+            proc.stdout, encoding='utf-8', errors='replace', newline='\n') as out:
+        yield from out
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, a[0])
 
 
 def blank_col(rows, i, blanks):
@@ -53,10 +81,15 @@ def blank_col(rows, i, blanks):
 
 def fext(fn):
     """File extension"""
-    res = fn.split('.')
+    res = fn.rsplit('/', 1)[-1].split('.')
     return res[-1] if len(res) > 1 else ''
 
 
+def fdir(fn, depth=1):
+    """Directory of `fn`, truncated to `depth` components (`.` if none)"""
+    return '/'.join(fn.split('/')[:-1][:depth]) or '.'
+
+
 def int_cast_or_len(i):
     """
     >>> int_cast_or_len(range(10))
@@ -89,14 +122,39 @@ def Max(it, empty_default=0):
         raise      # pragma: no cover
 
 
-def print_unicode(msg, end='\n', err='?'):
-    """print `msg`, replacing unicode characters with `err` upon failure"""
-    for c in msg:
+@lru_cache(maxsize=None)
+def _encode_errors(err):
+    """Name of a `codecs` error handler replacing unencodable characters with `err`"""
+    if err == '?':
+        return 'replace'
+    name = f"gitfame-replace-{err}"
+    codecs.register_error(name, lambda exc: (err * (exc.end - exc.start), exc.end))
+    return name
+
+
+def print_unicode(msg, end='\n', err='?', file=None, chunk_size=1 << 16):
+    """
+    print `msg` (str, or iterable of str chunks, e.g. rows as they are
+    rendered), replacing unencodable characters with `err`.
+    Chunks are written in batches of about `chunk_size` characters.
+    """
+    out = file or sys.stdout
+    encoding = getattr(out, 'encoding', None) or 'utf-8'
+
+    def write(text):
         try:
-            print(c, end='')
-        except UnicodeEncodeError:
-            print(err, end='')
-    print('', end=end)
+            out.write(text)
+        except UnicodeEncodeError: # nothing written: encoding precedes writing
+            out.write(text.encode(encoding, _encode_errors(err)).decode(encoding))
+
+    batch, size = [], 0
+    for chunk in [msg] if isinstance(msg, str) else msg:
+        batch.append(chunk)
+        if (size := size + len(chunk)) >= chunk_size:
+            write(''.join(batch))
+            batch, size = [], 0
+    batch.append(end)
+    write(''.join(batch))
 
 
 def Str(i):
@@ -107,11 +165,100 @@ def Str(i):
         return str(i)
 
 
+class PathTable:
+    """Interned paths, assigned integer IDs in order of first `intern`ment"""
+    __slots__ = ("ids", "paths", "_lock")
+
+    def __init__(self):
+        self.ids = {} # `{path: id}`
+        self.paths = [] # `[path, ...]` (by id)
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def intern(self, path):
+        """Returns the ID of `path` (adding it if needed)"""
+        if (i := self.ids.get(path)) is None:
+            with self._lock:
+                if (i := self.ids.get(path)) is None:
+                    i = self.ids[path] = len(self.paths)
+                    self.paths.append(path)
+        return i
+
+
+class FileSet(MutableSet):
+    """
+    Set of paths, stored as a compact array of integer IDs of a `PathTable`
+    (shared by all `FileSet`s of a run), only materialising path strings upon
+    iteration. IDs may be appended directly to `ids`: duplicates are only
+    removed when needed (e.g. for `len`).
+    """
+    __slots__ = ("table", "ids", "_clean")
+
+    def __init__(self, table=None, paths=()):
+        self.table = PathTable() if table is None else table
+        self.ids = array('I')
+        self._clean = 0 # `len(ids)` when last de-duplicated
+        self.update(paths)
+
+    def _from_iterable(self, paths):
+        return FileSet(self.table, paths)
+
+    def _compact(self):
+        """Returns (sorted) unique `ids`"""
+        if len(self.ids) != self._clean:
+            self.ids = array('I', sorted(set(self.ids)))
+            self._clean = len(self.ids)
+        return self.ids
+
+    def __contains__(self, path):
+        if (i := self.table.ids.get(path)) is None:
+            return False
+        ids = self._compact()
+        return (j := bisect_left(ids, i)) < len(ids) and ids[j] == i
+
+    def __iter__(self):
+        paths = self.table.paths
+        return (paths[i] for i in self._compact())
+
+    def __len__(self):
+        return len(self._compact())
+
+    def __eq__(self, other):
+        if isinstance(other, FileSet) and other.table is self.table:
+            return self._compact() == other._compact()
+        return super().__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({set(self)!r})"
+
+    def add(self, path):
+        self.ids.append(self.table.intern(path))
+
+    def discard(self, path):
+        if path in self:
+            self.ids.pop(bisect_left(self.ids, self.table.ids[path]))
+            self._clean -= 1
+
+    def update(self, paths):
+        """Add all `paths` (a fast array concatenation if sharing the same `table`)"""
+        if isinstance(paths, FileSet) and paths.table is self.table:
+            self.ids.extend(paths.ids)
+        else:
+            intern = self.table.intern
+            self.ids.extend(intern(path) for path in paths)
+
+
 def merge_stats(left, right):
     """Add `right`'s values to `left` (modifies `left` in-place)"""
     for k, val in right.items():
         if isinstance(val, int):
             left[k] = left.get(k, 0) + val
+        elif isinstance(val, Mapping): # `{group: int}`
+            merge_stats(left.setdefault(k, {}), val)
         elif hasattr(val, 'extend'):
             left[k].extend(val)
         elif hasattr(val, 'update'):
@@ -0,0 +1,8 @@
+from pytest import fixture
+
+
+@fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    """Keep the default blame cache (`$XDG_CACHE_HOME/git-fame`) out of `~`"""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path / "cache"
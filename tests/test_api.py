@@ -0,0 +1,62 @@
+import threading
+from concurrent.futures import CancelledError
+from json import loads
+from os import path
+
+from pytest import raises
+
+import gitfame
+
+ROOT = path.dirname(path.dirname(__file__))
+
+
+def test_fame(capsys):
+    """Test API results match the CLI"""
+    gitfame.main(['-s', '--no-cache', '--format=json', '--incl', r'\.py$', ROOT])
+    cli = loads(capsys.readouterr().out)
+    res = gitfame.fame(ROOT, include=r'\.py$', per_file=True)
+    assert res.totals == cli['total']
+    assert [[a.author, a.loc, a.commits, len(a.files)] for a in res.sorted()] == [i[:4] for i in cli['data']]
+    assert sum(f.loc for f in res.files) == res.totals['loc']
+    assert all(f.path.endswith('.py') for f in res.files)
+
+
+def test_fame_options():
+    """Test exact path filters, churn & email"""
+    res = gitfame.fame(ROOT, include=['README.rst', 'pyproject.toml'], loc='ins,del', show='email', bytype=True)
+    assert res.totals['files'] <= 2
+    assert all('@' in auth for auth in res.authors)
+    assert all(set(a.bytype) <= {'.rst', '.toml'} for a in res.authors.values())
+    assert all(a.hours > 0 for a in res.authors.values())
+
+
+def test_fame_mixed_filters():
+    """Test exact path & regex filters together"""
+    include = ['README.rst', 'tests/test_api.py', 'tests/test_utils.py']
+    files = {f.path for f in gitfame.fame(ROOT, include=include, exclude=r'_api', per_file=True).files}
+    assert files == {'README.rst', 'tests/test_utils.py'}
+    files = {f.path for f in gitfame.fame(ROOT, include=r'^tests/test_(api|utils)\.py$', exclude=['tests/test_api.py'],
+                                          per_file=True).files}
+    assert files == {'tests/test_utils.py'}
+
+
+def test_iter_files():
+    """Test per-file streaming & cancellation upon close"""
+    files = list(gitfame.iter_files(ROOT, include=r'\.py$', jobs=2))
+    assert [f.path for f in files] == [f.path for f in gitfame.fame(ROOT, include=r'\.py$', per_file=True).files]
+
+    cancel = threading.Event()
+    it = gitfame.iter_files(ROOT, jobs=1, cancel=cancel)
+    assert isinstance(next(it), gitfame.FileStats)
+    it.close()
+    assert cancel.is_set()
+
+
+def test_cancel():
+    """Test cancellation raises"""
+    cancel = threading.Event()
+    with raises(CancelledError):
+        gitfame.fame(ROOT, jobs=1, on_file=lambda _: cancel.set(), cancel=cancel)
+    cancel.clear()
+    with raises(CancelledError):
+        gitfame.fame(ROOT, loc='ins', on_file=lambda _: cancel.set(), cancel=cancel)
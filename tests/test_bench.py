@@ -0,0 +1,40 @@
+from json import load
+from os import path
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from benchmarks import bench, synth
+
+
+def test_synth_reproducible():
+    """Test same parameters & seed generate identical history"""
+    from gitfame._utils import check_output
+    tmp = mkdtemp()
+    try:
+        heads = {
+            check_output(["git", "-C", synth.make_repo(path.join(tmp, str(i)), 3, 5, 2, 4, 1), "rev-parse", "HEAD"])
+            for i in range(2)}
+    finally:
+        rmtree(tmp, True)
+    assert len(heads) == 1
+
+
+def test_bench(capsys):
+    """Test benchmarks run, save, & compare"""
+    tmp = mkdtemp()
+    argv = [
+        '--files=3', '--lines=5', '--depth=3', '--repos=2', '--rows=10', '--repeat=1', '--in-process',
+        '--bench=surv,churn,tabulate-md,multi-repo,startup-json,print-csv', f'--workdir={tmp}', f'--baseline-dir={tmp}']
+    try:
+        assert bench.main(argv + ['--save=base']) == 0
+        with open(path.join(tmp, "base.json")) as fd:
+            res = load(fd)
+        assert set(res["results"]) == {
+            "surv", "surv-process", "surv-async", "churn", "tabulate-md", "multi-repo", "multi-repo-churn",
+            "startup-json", "print-csv"}
+        assert all(r["items_per_s"] > 0 for r in res["results"].values())
+        # impossible speedup required
+        assert bench.main(argv + ['--bench=tabulate-md', '--compare=base', '--tolerance=-1']) == 1
+    finally:
+        rmtree(tmp, True)
+    assert "REGRESSION" in capsys.readouterr().out
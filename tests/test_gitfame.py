@@ -1,4 +1,6 @@
+import logging
 import operator
+import os
 import re
 import sys
 from json import loads
@@ -62,6 +64,31 @@ def test_tabulate_cost():
 | 12.2/ 0.0/28.6  |"""))
 
 
+def test_hours():
+    """Test hours estimate ignores duplicate commit times"""
+    ctimes = auth_stats['Casper da Costa-Luis']['ctimes']
+    assert len(set(ctimes)) < len(ctimes)
+    assert _gitfame.hours(set(ctimes)) == _gitfame.hours(ctimes)
+
+
+def test_log_numstat():
+    """Test streaming `git log --numstat` parsing & rename resolution"""
+    lines = [
+        "aNA aEa@x ct1\n", "\n", "1\t0\ta.txt\n", "-\t-\tb.png\n", "\n",
+        "aNB aEb@x ct2\n", # merge
+        "aNA aEa@x ct3\n", "\n", "2\t1\td/{e => f}/g.txt\n", "0\t0\t{ => h}/i.txt\n", "0\t0\tj/{k => }/l.txt\n",
+        "1\t1\tm.txt => n.txt\n",
+        "aNB aEb@x ct0\n", "\n", "3\t0\tm.txt\n", "1\t0\td/e/g.txt\n"] # before renames
+    renames = {}
+    assert list(_gitfame._log_numstat(lines, renames)) == [
+        ("A", "a@x", 1, [("1", "0", "a.txt"), ("-", "-", "b.png")]),
+        ("B", "b@x", 2, []),
+        ("A", "a@x", 3, [("2", "1", "d/f/g.txt"), ("0", "0", "h/i.txt"), ("0", "0", "j/l.txt"),
+                         ("1", "1", "n.txt")]),
+        ("B", "b@x", 0, [("3", "0", "n.txt"), ("1", "0", "d/f/g.txt")])]
+    assert renames == {"d/e/g.txt": "d/f/g.txt", "i.txt": "h/i.txt", "j/k/l.txt": "j/l.txt", "m.txt": "n.txt"}
+
+
 def test_tabulate_yaml():
     """Test YAML tabulate"""
     res = [
@@ -117,6 +144,16 @@ def test_tabulate_json():
     "%loc", "%coms", "%fils"]}""").replace('\n', ' ')))
 
 
+@mark.parametrize('backend', ['csv', 'json', 'md', 'svg'])
+def test_iter_tabulate(backend):
+    """Test streamed chunks match `tabulate`"""
+    stats = {f"author{i}": {'loc': i, 'files': {str(i)}, 'commits': 1, 'ctimes': {i}} for i in range(50)}
+    tot = {'loc': sum(range(50)), 'files': 50, 'commits': 50}
+    chunks = list(_gitfame.iter_tabulate(stats, tot, backend=backend, chunk_size=100))
+    assert len(chunks) > (1 if backend == "md" else 2)
+    assert ''.join(chunks) == _gitfame.tabulate(stats, tot, backend=backend)
+
+
 def test_tabulate_csv():
     """Test CSV tabulate"""
     csv = _gitfame.tabulate(auth_stats, stats_tot, backend='csv')
@@ -232,7 +269,8 @@ def test_tabulate_unknown():
 @mark.parametrize('params', [['--sort', 'commits'], ['--no-regex'], ['--no-regex', '--incl', 'setup.py,README.rst'],
                              ['--excl', r'.*\.py'], ['--loc', 'ins,del'], ['--cost', 'hour'], ['--cost', 'month'],
                              ['--cost', 'month', '--excl', r'.*\.py'], ['-e'], ['-w'], ['-M'], ['-C'], ['-t'],
-                             ['--show=name,email'], ['--format=csv'], ['--format=svg'], ['-j', '1'], ['-j', '4']])
+                             ['--show=name,email'], ['--format=csv'], ['--format=svg'], ['-j', '1'], ['-j', '4'],
+                             ['--jobs-mode=process'], ['--jobs-mode=async']])
 def test_options(params):
     """Test command line options"""
     main(['-s'] + params)
@@ -254,6 +292,30 @@ def test_main():
     assert ('Total commits' in str(res))
 
 
+@mark.parametrize('args,lazy', [(['--format=json', '--no-cache'], {'tabulate', 'tqdm', 'shtab', 'sqlite3'}),
+                                (['--format=md'], {'tqdm', 'shtab'}), (['--jobs-mode=thread'], {'asyncio', 'shtab'}),
+                                (['--timeline=2', '--format=json'], {'http', 'socketserver'})])
+def test_lazy_imports(args, lazy):
+    """Unused dependencies are not imported"""
+    import subprocess
+    res = subprocess.check_output((sys.executable, '-c', dedent(f'''\
+      import sys
+      from gitfame import main
+      main(["-s", "--branch=HEAD~3"] + {args!r})
+      print(sorted({{m.partition('.')[0] for m in sys.modules}} & {lazy!r}))
+      ''')), stderr=subprocess.STDOUT).decode('U8')
+    assert res.rstrip().split('\n')[-1] == "[]"
+
+
+def test_requested():
+    """Detection of (abbreviated, combined) options"""
+    assert _gitfame._requested(['-s', '--vers'], '--version', 'v')
+    assert _gitfame._requested(['-sv'], '--version', 'v')
+    assert _gitfame._requested(['--print-completion=bash'], '--print-completion')
+    assert not _gitfame._requested(['-s', '--', '--version'], '--version', 'v')
+    assert not _gitfame._requested(['--excl=v', 'version'], '--version', 'v')
+
+
 def test_main_errors(capsys):
     """Test bad options"""
     main(['--silent-progress'])
@@ -314,14 +376,167 @@ def test_multiple_gitdirs_loc(capsys):
 def test_jobs_determinism(capsys):
     """--jobs must not change output"""
     root = path.dirname(path.dirname(__file__))
-    main(['-s', '--format=json', '-j', '1', root])
+    main(['-s', '--no-cache', '--format=json', '-j', '1', root])
     serial = capsys.readouterr().out
-    main(['-s', '--format=json', '-j', '4', root])
+    main(['-s', '--no-cache', '--format=json', '-j', '4', root])
     parallel = capsys.readouterr().out
     assert serial == parallel
+    main(['-s', '--no-cache', '--format=json', '-j', '4', '--jobs-mode=process', root])
+    assert capsys.readouterr().out == serial
+    main(['-s', '--no-cache', '--format=json', '--jobs-mode=async', root])
+    assert capsys.readouterr().out == serial
     assert loads(serial)['total']['loc'] > 0
 
 
+def test_get_auth_stats():
+    """Test awaitable API matches synchronous results"""
+    import asyncio
+    root = path.dirname(path.dirname(__file__))
+    kwargs = {"include_files": re.compile(r"\.py$"), "silent_progress": True}
+    stats = asyncio.run(_gitfame.get_auth_stats(root, **kwargs))
+    assert stats == _gitfame._get_auth_stats(root, **kwargs)
+    assert sum(i['loc'] for i in stats.values()) > 0
+
+
+@mark.parametrize('mode', ['thread', 'process', 'async'])
+def test_split(mode):
+    """Test blaming large files in line ranges matches whole-file blames"""
+    from gitfame._sched import Scheduler
+    root = path.dirname(path.dirname(__file__))
+    kwargs = {"include_files": re.compile(r"\.py$"), "silent_progress": True}
+    with Scheduler(4, mode) as scheduler:
+        split = _gitfame._get_auth_stats(root, scheduler=scheduler, split_bytes=4096, **kwargs)
+    assert split == _gitfame._get_auth_stats(root, split_bytes=0, **kwargs)
+
+    assert _gitfame._line_ranges(10, 3) == ["1,4", "5,8", "9,10"]
+    assert _gitfame._line_ranges(2, 2) == ["1,1", "2,2"]
+    sha = _gitfame.check_output(["git", "-C", root, "rev-parse", "HEAD:README.rst"]).strip()
+    with open(path.join(root, "README.rst")) as fd:
+        assert _gitfame._line_counts(["git", "-C", root], [sha]) == {sha: len(fd.readlines())}
+
+
+def test_gather():
+    """Test merging (& failing) line range tallies"""
+    from concurrent.futures import CancelledError, Future
+    parts = [Future() for _ in range(3)]
+    res = _gitfame._gather(parts)
+    parts[0].set_result({"a": {"loc": 1, "ctimes": {1}}})
+    parts[2].set_result({"a": {"loc": 2, "ctimes": {2}}, "b": {"loc": 3, "ctimes": {1}}})
+    assert not res.done()
+    parts[1].set_result({})
+    assert res.result(timeout=1) == {"a": {"loc": 3, "ctimes": {1, 2}}, "b": {"loc": 3, "ctimes": {1}}}
+
+    parts = [Future() for _ in range(3)]
+    res = _gitfame._gather(parts)
+    parts[0].set_exception(RuntimeError("broken"))
+    with raises(RuntimeError, match="broken"):
+        res.result(timeout=1)
+    assert parts[1].cancelled() and parts[2].cancelled()
+
+    parts = [Future() for _ in range(2)]
+    res = _gitfame._gather(parts)
+    res.cancel()
+    assert all(i.cancelled() for i in parts)
+    with raises(CancelledError):
+        res.result(timeout=1)
+
+
+def test_scatter():
+    """Test splitting batched results"""
+    from concurrent.futures import Future
+    batch = Future()
+    parts = _gitfame._scatter(batch, 2)
+    batch.set_result(["a", "b"])
+    assert [i.result(timeout=1) for i in parts] == ["a", "b"]
+
+    batch = Future()
+    parts = _gitfame._scatter(batch, 2)
+    batch.set_exception(RuntimeError("broken"))
+    for part in parts:
+        with raises(RuntimeError, match="broken"):
+            part.result(timeout=1)
+
+    batch = Future()
+    parts = _gitfame._scatter(batch, 2)
+    parts[0].cancel()
+    assert not batch.cancelled()
+    parts[1].cancel()
+    assert batch.cancelled()
+
+
+def test_process_batches():
+    """--jobs-mode=process blames small files in batches"""
+    from unittest.mock import patch
+
+    from gitfame._sched import Scheduler
+    root = path.dirname(path.dirname(__file__))
+    kwargs = {"include_files": re.compile(r"\.py$"), "silent_progress": True, "split_bytes": 0}
+    with Scheduler(2, "process") as scheduler, patch.object(scheduler, 'submit', wraps=scheduler.submit) as submit:
+        stats = _gitfame._get_auth_stats(root, scheduler=scheduler, **kwargs)
+    assert stats == _gitfame._get_auth_stats(root, **kwargs)
+    nfiles = len(set().union(*(i['files'] for i in stats.values())))
+    assert 0 < submit.call_count < nfiles
+
+
+def test_groups():
+    """Test per-type & per-directory rollups"""
+    root = path.dirname(path.dirname(__file__))
+    stats = _gitfame._get_auth_stats(root, include_files=re.compile(r"\.(py|rst)$"), silent_progress=True,
+                                     bytype=True, by_dir=1)
+    for auth in stats.values():
+        assert set(auth['bytype']) <= {'.py', '.rst'}
+        assert sum(auth['bytype'].values()) == sum(auth['bydir'].values()) == auth['loc']
+        assert all('/' not in i for i in auth['bydir'])
+    assert 'bydir' not in _gitfame._totals(stats)
+
+    res = loads(_gitfame.tabulate(stats, _gitfame._totals(stats), bytype=True, backend='json'))
+    assert set(res['bydir']['columns']) >= {'Author', 'gitfame', 'tests', '.'}
+    assert sum(res['bytype']['total'].values()) == res['total']['loc']
+    assert "loc by directory" in _gitfame.tabulate(stats, _gitfame._totals(stats))
+
+
+@mark.parametrize('loc', ['surv', 'ins,del'])
+def test_profile(loc):
+    """Test --profile saves a Chrome trace & summary"""
+    tmp = mkdtemp()
+    fname = path.join(tmp, "profile.json")
+    root = path.dirname(path.dirname(__file__))
+    try:
+        main(['-s', '--no-cache', '-j', '2', '--format=json', f'--loc={loc}', f'--profile={fname}', root])
+        with open(fname) as fd:
+            res = loads(fd.read())
+    finally:
+        rmtree(tmp, True)
+
+    assert {"ph", "ts", "dur", "pid", "tid", "name"} <= set(res["traceEvents"][-1])
+    summary = res["summary"]
+    assert {"ls-tree", "binary-check", "merge", "render"} <= set(summary["phases"])
+    if loc == 'surv':
+        assert {"blame", "blames", "shortlog"} <= set(summary["phases"])
+        assert summary["phases"]["blame"]["bytes"] > 0
+        durations = [i["seconds"] for i in summary["slowest"]]
+        assert durations == sorted(durations, reverse=True)
+        assert summary["workers"]["jobs"] == 2
+        assert 0 < summary["workers"]["utilisation"] <= 1
+    else:
+        assert summary["phases"]["log"]["bytes"] > 0
+        assert "parse_seconds" in summary["phases"]["log"]
+        assert not summary["slowest"]
+
+
+@mark.parametrize('loc', ['surv', 'ins'])
+def test_jsonl(capsys, loc):
+    """Test --format=jsonl streams per-file records then totals"""
+    root = path.dirname(path.dirname(__file__))
+    gitdirs = [root, path.join(root, 'gitfame')] if loc == 'surv' else [root]
+    main(['-s', '--no-cache', '--format=jsonl', '--loc', loc, '-e'] + gitdirs)
+    *records, total = map(loads, capsys.readouterr().out.splitlines())
+    assert records and {i["repo"] for i in records} == set(gitdirs)
+    assert all('@' in i["author"] for i in records)
+    assert sum(i["loc"] for i in records) == total["total"]["loc"]
+    assert sum(i[1] for i in total["data"]) == total["total"]["loc"]
+
+
 def test_blame_failure_determinism(capsys, caplog):
     """Blame failures are reported identically (files, order, log level) at any --jobs"""
     import logging
@@ -330,19 +545,19 @@ def test_blame_failure_determinism(capsys, caplog):
 
     root = path.dirname(path.dirname(__file__))
     failing = ['LICENCE'] # text files, in `ls-files` order
-    real_check_output = _gitfame.check_output
+    real_iter_output = _gitfame.iter_output
 
-    def fake_check_output(args, *a, **k):
+    def fake_iter_output(args, *a, **k):
         if args[3:4] == ['blame'] and args[-1] in failing:
             raise subprocess.CalledProcessError(1, args)
-        return real_check_output(args, *a, **k)
+        return real_iter_output(args, *a, **k)
 
     caplog.set_level(logging.DEBUG, logger='gitfame._gitfame')
     runs = []
     for jobs in ('1', '4'):
-        with patch.object(_gitfame, 'check_output', fake_check_output):
+        with patch.object(_gitfame, 'iter_output', fake_iter_output):
             caplog.clear()
-            main(['-s', '--format=json', '-j', jobs, root])
+            main(['-s', '--no-cache', '--format=json', '-j', jobs, root])
             out = capsys.readouterr().out
         reported = [(r.levelname, r.getMessage()) for r in caplog.records
                     if r.name == 'gitfame._gitfame' and r.getMessage().split(':', 1)[0] in failing]
@@ -356,3 +571,313 @@ def test_blame_failure_determinism(capsys, caplog):
     # and the report itself is byte-identical (and non-empty)
     assert serial_out == parallel_out
     assert loads(serial_out)['total']['loc'] > 0
+
+
+def git_commit(repo, files, message="update", author="tester"):
+    """Write `files` (`{name: content}`) & commit them to `repo` (created if needed)"""
+    import subprocess
+    if not path.isdir(path.join(repo, '.git')):
+        subprocess.check_call(["git", "init", "-q", repo])
+    for name, content in files.items():
+        with open(path.join(repo, name), 'w') as fd:
+            fd.write(content)
+    subprocess.check_call(["git", "-C", repo, "add", "-A"])
+    subprocess.check_call([
+        "git", "-C", repo, "-c", f"user.name={author}", "-c", f"user.email={author}@example.com", "commit",
+        "--no-gpg-sign", "-qm", message])
+
+
+def test_cache(capsys):
+    """Cached blames are reused until their file changes"""
+    from unittest.mock import patch
+    tmp = mkdtemp()
+    repo, cache_dir = path.join(tmp, "repo"), path.join(tmp, "cache")
+    real_iter_output = _gitfame.iter_output
+    blamed = []
+
+    def fake_iter_output(args, *a, **k):
+        if args[3:4] == ['blame']:
+            blamed.append(args[-1])
+        return real_iter_output(args, *a, **k)
+
+    def fame(*args):
+        blamed.clear()
+        with patch.object(_gitfame, 'iter_output', fake_iter_output):
+            main(['-s', '--format=json', repo] + list(args))
+        return loads(capsys.readouterr().out)
+
+    try:
+        git_commit(repo, {"a.txt": "one\ntwo\n", "b.txt": "three\n"}, author="alice")
+        cold = fame('--cache-dir', cache_dir)
+        assert sorted(blamed) == ["a.txt", "b.txt"]
+        assert fame('--cache-dir', cache_dir) == cold
+        assert blamed == []
+
+        git_commit(repo, {"b.txt": "three\nfour\n"}, author="bob")
+        warm = fame('--cache-dir', cache_dir)
+        assert blamed == ["b.txt"]
+        assert warm == fame('--no-cache')
+        assert warm['total']['loc'] == 4
+
+        # different options are cached separately
+        fame('--cache-dir', cache_dir, '-w')
+        assert sorted(blamed) == ["a.txt", "b.txt"]
+    finally:
+        rmtree(tmp, True)
+
+
+def test_checkpoint(capsys, caplog):
+    """Interrupted runs resume from the journal, skipping incomplete entries"""
+    from unittest.mock import patch
+    tmp = mkdtemp()
+    repo, journal = path.join(tmp, "repo"), path.join(tmp, "journal.jsonl")
+    real_iter_output = _gitfame.iter_output
+    blamed = []
+
+    def fake_iter_output(args, *a, **k):
+        if args[3:4] == ['blame']:
+            blamed.append(args[-1])
+            if args[-1] == "c.txt" and "fail" in blamed:
+                raise KeyboardInterrupt
+        return real_iter_output(args, *a, **k)
+
+    def fame(*args):
+        blamed.clear()
+        with patch.object(_gitfame, 'iter_output', fake_iter_output):
+            main(['-s', '--no-cache', '-j1', '--format=json', '--checkpoint', journal, repo] + list(args))
+        return loads(capsys.readouterr().out)
+
+    try:
+        git_commit(repo, {"a.txt": "one\ntwo\n", "b.txt": "three\n", "c.txt": "x\n"}, author="alice")
+        # largest first: a.txt, b.txt, c.txt (interrupted)
+        blamed.append("fail")
+        with patch.object(_gitfame, 'iter_output', fake_iter_output), raises(KeyboardInterrupt):
+            main(['-s', '--no-cache', '-j1', '--checkpoint', journal, repo])
+        with open(journal) as fd:
+            assert sorted(loads(line)["path"] for line in fd) == ["a.txt", "b.txt"]
+        with open(journal, 'a') as fd: # killed mid-write
+            fd.write('{"repo": ')
+
+        res = fame()
+        assert blamed == ["c.txt"]
+        assert res == fame('--checkpoint', path.join(tmp, "other.jsonl"))
+        assert fame() == res and not blamed
+        # different options are journalled separately
+        fame('-w')
+        assert sorted(blamed) == ["a.txt", "b.txt", "c.txt"]
+        with open(journal) as fd: # including the incomplete entry
+            assert sum(1 for _ in fd) == 7
+
+        git_commit(repo, {"b.txt": "three\nfour\n"}, author="bob")
+        assert fame()['total']['loc'] == 5
+        assert sorted(blamed) == ["a.txt", "b.txt", "c.txt"]
+
+        with caplog.at_level(logging.WARNING):
+            fame('--loc=ins')
+        assert "--checkpoint requires --loc=surviving" in caplog.text
+    finally:
+        rmtree(tmp, True)
+
+
+@mark.parametrize('loc', ['surv', 'ins,del'])
+def test_incremental(capsys, loc):
+    """--incremental only re-processes changes, with identical results"""
+    from unittest.mock import patch
+    tmp = mkdtemp()
+    repo, cache_dir = path.join(tmp, "repo"), path.join(tmp, "cache")
+    calls = []
+
+    def spy(func):
+        def wrapped(args, *a, **k):
+            calls.append(args[3:])
+            return func(args, *a, **k)
+
+        return wrapped
+
+    def fame(*args):
+        calls.clear()
+        with patch.object(_gitfame, 'check_output', spy(_gitfame.check_output)), \
+                patch.object(_gitfame, 'iter_output', spy(_gitfame.iter_output)):
+            main(['-s', '--format=json', '--loc', loc, repo] + list(args))
+        return loads(capsys.readouterr().out)
+
+    try:
+        git_commit(repo, {"a.txt": "one\ntwo\n", "b.txt": "three\n"}, author="alice")
+        fame('--incremental', '--cache-dir', cache_dir)
+        git_commit(repo, {"b.txt": "three\nfour\n", "c.txt": "five\n"}, author="bob")
+        res = fame('--incremental', '--cache-dir', cache_dir)
+        walks = [cmd[-1] for cmd in calls if cmd[0] in ('log', 'shortlog')]
+        assert walks and all('..' in rev for rev in walks)
+        if loc == 'surv':
+            assert sorted(cmd[-1] for cmd in calls if cmd[0] == 'blame') == ["b.txt", "c.txt"]
+        assert res == fame('--no-cache')
+        assert res['total']['commits'] == 2
+
+        # reverted changes are still attributed to the reverting commit
+        git_commit(repo, {"a.txt": "one\n2\n"}, author="bob")
+        git_commit(repo, {"a.txt": "one\ntwo\n"}, author="carol")
+        res = fame('--incremental', '--cache-dir', cache_dir)
+        assert res == fame('--no-cache')
+        if loc == 'surv':
+            assert {i[0]: i[1] for i in res['data']} == {"alice": 2, "bob": 2, "carol": 1}
+    finally:
+        rmtree(tmp, True)
+
+
+def test_incremental_loc(capsys):
+    """--incremental results of different --loc types are kept apart"""
+    tmp = mkdtemp()
+    repo, cache_dir = path.join(tmp, "repo"), path.join(tmp, "cache")
+
+    def fame(*args):
+        main(['-s', '--format=json', repo] + list(args))
+        return loads(capsys.readouterr().out)
+
+    try:
+        git_commit(repo, {"a.txt": "one\ntwo\nthree\n"})
+        git_commit(repo, {"a.txt": "one\n"})
+        assert fame('--incremental', '--cache-dir', cache_dir, '--loc=ins')['total']['loc'] == 3
+        res = fame('--incremental', '--cache-dir', cache_dir, '--loc=ins,del')
+        assert res == fame('--no-cache', '--loc=ins,del')
+        assert res['total']['loc'] == 5
+    finally:
+        rmtree(tmp, True)
+
+
+def test_binary_files(caplog):
+    """Binary, empty & `.gitattributes` binary files are skipped"""
+    import logging
+    import subprocess
+
+    from gitfame._cache import BlameCache
+    tmp = mkdtemp()
+    repo, cache_dir = path.join(tmp, "repo"), path.join(tmp, "cache")
+    try:
+        git_commit(
+            repo, {
+                ".gitattributes": "*.bin binary\n*.gen -diff\n", "text.txt": "text\n", "nul.dat": "a\0b\n",
+                "late_nul.txt": "x" * 9000 + "\0\n", "attr.bin": "text\n", "attr.gen": "text\n", "empty.txt": ""})
+        caplog.set_level(logging.WARNING, logger='gitfame._gitfame')
+        for _ in range(2): # cold & warm cache
+            caplog.clear()
+            main(['-s', '--warn-binary', '--format=json', '--cache-dir', cache_dir, repo])
+            assert sorted(r.getMessage() for r in caplog.records if r.name == 'gitfame._gitfame') == [
+                "binary:attr.bin", "binary:attr.gen", "binary:empty.txt", "binary:nul.dat"]
+        blobs = subprocess.check_output(["git", "-C", repo, "rev-parse", "HEAD:nul.dat", "HEAD:text.txt"])
+        with BlameCache(cache_dir) as cache:
+            assert cache.lookup_blobs(blobs.decode().split()) == dict(zip(blobs.decode().split(), (True, False)))
+    finally:
+        rmtree(tmp, True)
+
+
+def test_cache_eviction():
+    """Least recently used blames & blobs beyond `max_entries` are evicted"""
+    from gitfame._cache import BlameCache
+    tmp = mkdtemp()
+    try:
+        with BlameCache(tmp, max_entries=2) as cache:
+            for fname in "abc":
+                cache.store("repo", "opts", {fname: {}}, "sha")
+                cache.touch("repo", "opts", ["a"], "sha")
+            assert sorted(cache.lookup("repo", "opts", "abc")) == ["a", "c"]
+
+            for sha in "abc":
+                cache.store_blobs({sha: sha == "a"})
+                cache.lookup_blobs(["a"])
+            assert cache.lookup_blobs("abc") == {"a": True, "c": False}
+    finally:
+        rmtree(tmp, True)
+
+
+def test_touched_since():
+    """Paths changed since an ancestor commit (or `None` for diverged history)"""
+    import subprocess
+    tmp = mkdtemp()
+    repo = path.join(tmp, "repo")
+    git_cmd = ["git", "-C", repo]
+    try:
+        git_commit(repo, {"a.txt": "one\n", "b.txt": "two\n"})
+        base = subprocess.check_output(git_cmd + ["rev-parse", "HEAD"]).decode().strip()
+        git_commit(repo, {"a.txt": "1\n"})
+        tip = subprocess.check_output(git_cmd + ["rev-parse", "HEAD"]).decode().strip()
+        assert _gitfame._touched_since(git_cmd, base, tip) == {"a.txt"}
+        assert _gitfame._touched_since(git_cmd, tip, tip) == set()
+        assert _gitfame._touched_since(git_cmd, tip, base) is None
+        subprocess.check_call(git_cmd + ["-c", "user.name=tester", "-c", "user.email=tester@example.com",
+                                         "commit", "--no-gpg-sign", "-q", "--amend", "-m", "rewritten"])
+        rewritten = subprocess.check_output(git_cmd + ["rev-parse", "HEAD"]).decode().strip()
+        assert _gitfame._touched_since(git_cmd, tip, rewritten) is None
+        assert _gitfame._touched_since(git_cmd, "0" * 40, tip) is None
+    finally:
+        rmtree(tmp, True)
+
+
+@mark.parametrize('mode', ['thread', 'async'])
+def test_carriage_return(capsys, mode):
+    """A lone `\r` within a blamed line is not a line break"""
+    tmp = mkdtemp()
+    repo = path.join(tmp, "repo")
+    try:
+        git_commit(repo, {"cr.txt": "one\rmid a b c\ntwo\nthree\n", "lf.txt": "four\nfive\n"})
+        main(['-s', '--no-cache', '--format=json', f'--jobs-mode={mode}', repo])
+        res = loads(capsys.readouterr().out)
+    finally:
+        rmtree(tmp, True)
+    assert res['total']['loc'] == 5
+    assert res['total']['files'] == 2
+
+
+@mark.parametrize('incremental', [False, True])
+def test_churn_renames(capsys, incremental):
+    """--loc=ins,del follows files across renames"""
+    import subprocess
+    tmp = mkdtemp()
+    repo, cache_dir = path.join(tmp, "repo"), path.join(tmp, "cache")
+    args = ['-s', '--format=json', '--loc=ins,del'] + (['--incremental', '--cache-dir', cache_dir]
+                                                       if incremental else ['--no-cache'])
+    try:
+        os.makedirs(path.join(repo, "docs"))
+        git_commit(repo, {"docs/readme.md": "one\ntwo\nthree\n"}, author="alice")
+        git_commit(repo, {"docs/readme.md": "one\n2\nthree\n"}, author="bob")
+        if incremental:
+            main(args + [repo])
+            capsys.readouterr()
+        subprocess.check_call(["git", "-C", repo, "mv", "docs/readme.md", "docs/README.md"])
+        git_commit(repo, {}, author="carol")
+        main(args + [repo])
+        res = loads(capsys.readouterr().out)
+    finally:
+        rmtree(tmp, True)
+    assert {i[0]: i[1] for i in res['data']} == {"alice": 3, "bob": 2, "carol": 0}
+    assert all(i[3] == 1 for i in res['data']) # files
+
+
+def test_churn_commits(capsys):
+    """--loc=ins,del counts commits (including merges) without `git shortlog`"""
+    import subprocess
+    from unittest.mock import patch
+    tmp = mkdtemp()
+    repo = path.join(tmp, "repo")
+    real_check_output = _gitfame.check_output
+
+    def fake_check_output(args, *a, **k):
+        assert args[3:4] != ['shortlog']
+        return real_check_output(args, *a, **k)
+
+    try:
+        git_commit(repo, {"a.txt": "one\n"}, author="alice")
+        subprocess.check_call(["git", "-C", repo, "checkout", "-qb", "side"])
+        git_commit(repo, {"b.txt": "two\n"}, author="bob")
+        subprocess.check_call(["git", "-C", repo, "checkout", "-q", "-"])
+        git_commit(repo, {"c.txt": "three\n"}, author="alice")
+        subprocess.check_call([
+            "git", "-C", repo, "-c", "user.name=carol", "-c", "user.email=carol@example.com", "merge", "-q",
+            "--no-edit", "--no-gpg-sign", "side"])
+        with patch.object(_gitfame, 'check_output', fake_check_output):
+            main(['-s', '--no-cache', '--format=json', '--loc=ins,del', repo])
+        res = loads(capsys.readouterr().out)
+    finally:
+        rmtree(tmp, True)
+
+    assert res['total']['commits'] == 4
+    assert {i[0]: i[2] for i in res['data']} == {"alice": 2, "bob": 1, "carol": 1}
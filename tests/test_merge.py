@@ -0,0 +1,85 @@
+from io import StringIO
+from json import loads
+from os import path
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from pytest import raises
+
+from gitfame import _gitfame, main
+from gitfame._merge import merge
+
+from .test_gitfame import git_commit
+
+
+def test_shard_files():
+    """Deterministic, size-balanced, exhaustive & disjoint partitions"""
+    sizes = {"a": 50, "b": 40, "c": 30, "d": 20, "e": 10, "f": 10}
+    files = list(sizes)
+    shards = [_gitfame._shard_files(files, sizes, (i, 3)) for i in (1, 2, 3)]
+    assert shards == [["a", "f"], ["b", "e"], ["c", "d"]]
+    assert _gitfame._shard_files(files, sizes, (1, 1)) == files
+    assert _gitfame._shard_files(files[::-1], sizes, (2, 3)) == ["e", "b"]
+    assert _gitfame._shard("2/3") == (2, 3)
+    for spec in ("0/3", "4/3", "3", "a/b"):
+        with raises(ValueError):
+            _gitfame._shard(spec)
+
+
+def test_partial():
+    """`--format=partial` round-trip"""
+    auth_stats = {"ä": {"loc": 2, "files": {"b", "a"}, "ctimes": {3, 1}, "commits": 1, ".py": 2}}
+    partial = _gitfame.tabulate(auth_stats, {}, backend="partial")
+    assert loads(partial)["authors"]["ä"]["files"] == ["a", "b"]
+    assert _gitfame.load_partial(partial) == auth_stats
+    with raises(ValueError):
+        _gitfame.load_partial('{"total": {}}')
+
+
+def test_merge(capsys):
+    """Merging shards is equivalent to an unsharded run"""
+    tmp = mkdtemp()
+    repo = path.join(tmp, "repo")
+
+    def load(fname):
+        with open(fname) as fd:
+            return loads(fd.read())
+
+    def cli(*args):
+        main(['-s', '--no-cache', repo] + list(args))
+        return capsys.readouterr().out
+
+    try:
+        git_commit(repo, {"a.txt": "one\ntwo\n", "b.py": "three\n", "c.txt": "x\n" * 9}, author="alice")
+        git_commit(repo, {"b.py": "three\nfour\n", "d.txt": "y\n"}, author="bob")
+        parts = []
+        for i in (1, 2, 3):
+            parts.append(path.join(tmp, f"part{i}.json"))
+            with open(parts[-1], 'w') as fd:
+                fd.write(cli(f'--shard={i}/3', '--format=partial'))
+        files = [set(load(p)["authors"].get("alice", {}).get("files", [])) for p in parts]
+        assert set.union(*files) == {"a.txt", "b.py", "c.txt"} and not files[0] & files[1]
+        assert load(parts[0])["authors"]["alice"]["commits"] == 1
+        assert load(parts[1])["authors"]["alice"]["commits"] == 0
+
+        for opts in ([], ['--format=json', '--sort=commits', '--enum'], ['--cost=hours,months', '--min=2']):
+            main(['merge'] + parts + opts)
+            assert capsys.readouterr().out == cli(*opts)
+
+        from unittest.mock import patch
+        with open(parts[0]) as fd, patch('sys.stdin', StringIO(fd.read())):
+            main(['merge', '--format=json'])
+        assert loads(capsys.readouterr().out)["total"]["commits"] == 2
+    finally:
+        rmtree(tmp, True)
+
+
+def test_merge_order():
+    """Authors in order of first appearance, with stats combined"""
+    auth_stats, stats_tot = merge([
+        {"b": {"loc": 1, "files": {"x"}, "ctimes": {1}, "commits": 1}},
+        {"a": {"loc": 2, "files": {"y"}, "ctimes": {2}, "commits": 0},
+         "b": {"loc": 3, "files": {"z"}, "ctimes": {1, 3}, "commits": 0}}])
+    assert list(auth_stats) == ["b", "a"]
+    assert auth_stats["b"] == {"loc": 4, "files": {"x", "z"}, "ctimes": {1, 3}, "commits": 1}
+    assert stats_tot == {"loc": 6, "files": 3, "ctimes": 3, "commits": 1}
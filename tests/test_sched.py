@@ -0,0 +1,166 @@
+from threading import Event, Lock, Thread
+from time import sleep
+
+from gitfame import _sched
+
+
+def test_largest_first():
+    """Test queued tasks run largest first"""
+    order = []
+    started = Event()
+    release = Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    with _sched.Scheduler(1) as sched:
+        sched.submit(0, block)
+        started.wait()
+        futures = [sched.submit(size, order.append, size) for size in (1, 3, 2)]
+        release.set()
+        for fut in futures:
+            fut.result()
+    assert order == [3, 2, 1]
+
+
+def test_bounded():
+    """Test at most `jobs` tasks run at once"""
+    lock = Lock()
+    running = [0, 0] # current, max
+
+    def task(i):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        sleep(0.01)
+        with lock:
+            running[0] -= 1
+        if i == 3:
+            raise ValueError(i)
+        return i
+
+    with _sched.Scheduler(2) as sched:
+        futures = [sched.submit(i, task, i) for i in range(8)]
+        assert [fut.exception() is not None for fut in futures] == [i == 3 for i in range(8)]
+        assert [fut.result() for i, fut in enumerate(futures) if i != 3] == [0, 1, 2, 4, 5, 6, 7]
+    assert running[1] == 2
+
+
+def test_slot():
+    """Test slots count towards (& take precedence over queued tasks within) `jobs`"""
+    order = []
+    started, release, done = Event(), Event(), Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    def hold():
+        with sched.slot():
+            order.append("slot")
+            done.wait()
+
+    with _sched.Scheduler(1) as sched:
+        with sched.slot():
+            fut = sched.submit(0, order.append, "task")
+            sleep(0.01)
+            assert not fut.done()
+        fut.result()
+
+        blocker = sched.submit(0, block)
+        started.wait()
+        queued = sched.submit(0, order.append, "queued")
+        thread = Thread(target=hold)
+        thread.start()
+        sleep(0.01)
+        assert order == ["task"] # all busy
+        release.set()
+        blocker.result()
+        sleep(0.01)
+        assert not queued.done() # waiting for the slot
+        done.set()
+        thread.join()
+        queued.result()
+    assert order == ["task", "slot", "queued"]
+
+
+def test_shutdown():
+    """Test shutdown cancels queued tasks"""
+    started = Event()
+    release = Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    sched = _sched.Scheduler(1)
+    running = sched.submit(0, block)
+    started.wait()
+    queued = sched.submit(0, int)
+    closer = Thread(target=sched.shutdown)
+    closer.start()
+    while not queued.done():
+        sleep(0.001)
+    release.set()
+    closer.join()
+    assert running.result() is None
+    assert queued.cancelled()
+
+
+def test_async():
+    """Test coroutines run on the event loop"""
+    import asyncio
+
+    async def task(i):
+        await asyncio.sleep(0.01 * (3-i))
+        return i
+
+    with _sched.Scheduler(mode="async") as sched:
+        assert sched.jobs == _sched.ASYNC_JOBS
+        futures = [sched.submit(i, task, i) for i in range(3)]
+        assert [fut.result() for fut in futures] == [0, 1, 2]
+    assert sched.loop.is_closed()
+
+
+def test_tuner():
+    """Test `limit` hill-climbs on throughput & backs off under memory pressure"""
+    now = [0.0]
+    memory = [(None, None, None)]
+    tuner = _sched.Tuner(16, 2, max_memory=100, interval=1, memory=lambda: memory[0], clock=lambda: now[0])
+
+    def window(nbytes, tasks=None):
+        """Complete `tasks` [default: `limit`] tasks totalling `nbytes` in a second"""
+        tasks = tasks or tuner.limit
+        now[0] += 1
+        for _ in range(tasks - 1):
+            tuner.record(0, 0.1)
+        return tuner.record(nbytes - tasks * _sched.TASK_BYTES, 0.1)
+
+    assert tuner.limit == 2
+    assert window(1000) == 4 # doubling
+    assert window(2000) == 8
+    assert window(2000) == 8 # steady
+    assert window(1000) == 6 # dropped: reverse
+    assert window(2000) == 5 # improved: continue
+    assert window(1000) == 6 # dropped: reverse
+    now[0] += 1
+    assert tuner.record(1 << 20, 0.1) == 6 # too few tasks for a decision
+
+    memory[0] = (1000, 100_000, 10) # low system memory
+    assert window(5000) == 3
+    memory[0] = (100_000, 100_000, 40) # `max_memory` allows at most 2
+    assert window(5000) == 1
+    assert window(10000) == 2
+    assert window(20000) == 2
+
+
+def test_adaptive():
+    """Test `limit` is only adapted if `jobs` is unspecified"""
+    with _sched.Scheduler(3) as sched:
+        assert sched.tuner is None and sched.limit == 3
+    with _sched.Scheduler(max_jobs=3, max_memory=1 << 30) as sched:
+        assert sched.jobs == 3 and 1 <= sched.limit <= 3
+        assert sched.tuner.max_memory == 1 << 30
+        futures = [sched.submit(i, int, i) for i in range(8)]
+        assert [fut.result() for fut in futures] == list(range(8))
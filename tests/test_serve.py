@@ -0,0 +1,141 @@
+import socket
+import sys
+from http.client import HTTPConnection
+from json import loads
+from os import path
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Thread
+
+from pytest import mark, raises, skip
+
+from gitfame import _gitfame, _serve, main
+
+from .test_gitfame import git_commit
+
+
+def test_query(capsys):
+    """Queries match the command-line, & refreshes only re-blame changes"""
+    from unittest.mock import patch
+    tmp = mkdtemp()
+    repo = path.join(tmp, "repo")
+    real_iter_output = _gitfame.iter_output
+    blamed = []
+
+    def fake_iter_output(args, *a, **k):
+        if args[3:4] == ['blame']:
+            blamed.append(args[-1])
+        return real_iter_output(args, *a, **k)
+
+    def cli(*args):
+        main(['-s', '--no-cache', repo] + list(args))
+        return capsys.readouterr().out.rstrip('\n')
+
+    try:
+        git_commit(repo, {"a.txt": "one\ntwo\n", "b.py": "three\n", "c.txt": "x\n"}, author="alice")
+        git_commit(repo, {"b.py": "three\nfour\n"}, author="bob")
+        with patch.object(_gitfame, 'iter_output', fake_iter_output), _serve.Server([repo], interval=0) as fame:
+            assert sorted(blamed) == ["a.txt", "b.py", "c.txt"]
+            assert fame.query() == cli()
+            assert fame.query(format="json", sort="commits", show="name,email") == cli(
+                '--format=json', '--sort=commits', '--show=name,email')
+            assert fame.query(incl=r"\.py$", bytype=True, enum=True) == cli(r'--incl=\.py$', '-t', '--enum')
+            assert fame.query(incl="a.txt,b.py", no_regex=True, format="csv") == cli(
+                '--incl=a.txt,b.py', '-n', '--format=csv')
+            assert fame.query(excl="a", cost="months", sort="months") == cli(
+                '--excl=a', '--cost=months', '--loc=surv', '--sort=months')
+            with raises(KeyError):
+                fame.query(["missing"])
+
+            blamed.clear()
+            assert fame.refresh() == {repo: False}
+            git_commit(repo, {"a.txt": "one\n", "d.txt": "five\n"}, author="carol")
+            _gitfame.check_output(["git", "-C", repo, "rm", "-q", "c.txt"])
+            git_commit(repo, {}, author="carol")
+            old = fame.repos[repo].snapshot
+            assert fame.refresh() == {repo: True}
+            assert sorted(blamed) == ["a.txt", "d.txt"]
+            # replaced (as a whole) rather than mutated
+            assert fame.repos[repo].snapshot.tip != old.tip and "c.txt" in old.tallies
+            assert fame.query(format="json") == cli('--format=json')
+            assert fame.status()[repo]["files"] == 3
+
+            # no file changes
+            _gitfame.check_output(["git", "-C", repo, "-c", "user.name=dave", "-c", "user.email=dave@example.com",
+                                   "commit", "--no-gpg-sign", "--allow-empty", "-qm", "empty"])
+            blamed.clear()
+            assert fame.refresh() == {repo: True}
+            assert not blamed
+            assert fame.query(format="json", sort="commits") == cli('--format=json', '--sort=commits')
+    finally:
+        rmtree(tmp, True)
+
+
+def test_multiple_gitdirs(capsys):
+    """Queries across (& restricted to) multiple gitdirs"""
+    gitdirs = ['.', 'gitfame']
+    with _serve.Server(gitdirs, interval=0, cache_dir=None) as fame:
+        main(['-s', '--no-cache', '--format=json'] + gitdirs)
+        assert loads(fame.query(format="json")) == loads(capsys.readouterr().out)
+        main(['-s', '--no-cache', '--format=json', 'gitfame'])
+        assert loads(fame.query(["gitfame"], format="json")) == loads(capsys.readouterr().out)
+
+
+@mark.parametrize('unix', [False, True])
+def test_http(unix):
+    """HTTP requests (over TCP or a Unix socket)"""
+    if unix and not hasattr(socket, "AF_UNIX"):
+        skip("Unix sockets not supported")
+    tmp = mkdtemp()
+    try:
+        with _serve.Server(['.'], interval=0, cache_dir=None) as fame:
+            httpd = _serve.serve(fame, path.join(tmp, "sock") if unix else "127.0.0.1:0")
+            thread = Thread(target=httpd.serve_forever, daemon=True)
+            thread.start()
+            try:
+                if unix:
+                    class UnixHTTPConnection(HTTPConnection):
+                        def connect(self):
+                            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                            self.sock.connect(httpd.server_address)
+
+                    conn = UnixHTTPConnection("localhost")
+                else:
+                    conn = HTTPConnection(*httpd.server_address)
+
+                def request(method, url):
+                    conn.request(method, url)
+                    res = conn.getresponse()
+                    return res.status, res.read().decode('utf-8')
+
+                assert request("GET", "/?format=json&sort=files&enum=0") == (200, fame.query(
+                    format="json", sort="files") + '\n')
+                assert request("GET", "/?incl=%5Cw%2B.py&enum") == (200, fame.query(incl=r"\w+.py", enum=True) + '\n')
+                status, body = request("GET", "/status")
+                assert status == 200 and loads(body)['.']['files'] > 0
+                assert request("GET", "/?format=unknown")[0] == 400
+                assert request("GET", "/?repo=missing")[0] == 400
+                assert request("GET", "/?min=x")[0] == 400
+                assert request("GET", "/?incl=%28")[0] == 400 # invalid regex `(`
+                assert request("GET", "/missing")[0] == 404
+                status, body = request("POST", "/refresh")
+                assert status == 200 and loads(body) == fame.status()
+                assert request("POST", "/missing")[0] == 404
+                conn.close()
+            finally:
+                httpd.shutdown()
+                httpd.server_close()
+    finally:
+        rmtree(tmp, True)
+
+
+def test_main(capsys):
+    """`git-fame serve` dispatch"""
+    with raises(SystemExit):
+        main(['serve', '--help'])
+    assert 'git-fame serve' in capsys.readouterr().out
+
+    from unittest.mock import patch
+    with patch.object(_serve.socketserver.BaseServer, 'serve_forever', side_effect=KeyboardInterrupt), \
+            patch.object(sys, 'argv', ['git-fame', 'serve', '--no-cache', '--interval=0.01', '--bind=0']):
+        main()
@@ -0,0 +1,119 @@
+import subprocess
+from json import loads
+from os import path
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from pytest import fixture, raises
+
+from gitfame import _gitfame, main
+from gitfame._sched import Scheduler
+from gitfame._timeline import iter_timeline, sample_times, timeline
+
+from .test_gitfame import git_commit
+
+
+@fixture
+def repo(monkeypatch):
+    """alice (2020-01-01) then bob (2020-01-03) then alice (2020-01-05, tagged)"""
+    tmp = mkdtemp()
+    repo = path.join(tmp, "repo")
+    try:
+        for day, author, files in (
+                (1, "alice", {"a.txt": "one\ntwo\n", "b.txt": "three\n"}),
+                (3, "bob", {"b.txt": "three\nfour\nfive\n"}),
+                (5, "alice", {"c.txt": "six\n"})):
+            monkeypatch.setenv("GIT_COMMITTER_DATE", f"2020-01-0{day}T12:00:00Z")
+            monkeypatch.setenv("GIT_AUTHOR_DATE", f"2020-01-0{day}T12:00:00Z")
+            git_commit(repo, files, author=author)
+        subprocess.check_call(["git", "-C", repo, "tag", "v1"])
+        monkeypatch.delenv("GIT_COMMITTER_DATE")
+        monkeypatch.delenv("GIT_AUTHOR_DATE")
+        yield repo
+    finally:
+        rmtree(tmp, True)
+
+
+def test_sample_times(repo):
+    """<n>, <interval> & rev-list specs"""
+    day = 86400
+    start = sample_times(repo, "1")[0] - 4 * day
+    assert sample_times(repo, "3") == [start, start + 2 * day, start + 4 * day]
+    assert sample_times(repo, "2.days") == [start, start + 2 * day, start + 4 * day]
+    assert sample_times(repo, "3 day", until="2020-01-04") == [start + 2 * day]
+    assert sample_times(repo, "3", since="2020-01-02") == [start + 2 * day, start + 3 * day, start + 4 * day]
+    assert sample_times(repo, "--tags") == [start + 4 * day]
+    assert sample_times(repo, "HEAD~2..HEAD") == [start + 2 * day, start + 4 * day]
+    with raises(ValueError):
+        sample_times(repo, "5", since="2021-01-01")
+
+
+def test_timeline(repo):
+    """Values at each point, only re-blaming files changed since the previous"""
+    from unittest.mock import patch
+    real_iter_output = _gitfame.iter_output
+    blamed = []
+
+    def fake_iter_output(args, *a, **k):
+        if args[3:4] == ['blame']:
+            blamed.append(args[-1])
+        return real_iter_output(args, *a, **k)
+
+    with patch.object(_gitfame, 'iter_output', fake_iter_output), Scheduler() as scheduler:
+        labels, values, totals = timeline([repo], "1.day", scheduler, cache_dir=None)
+        assert sorted(blamed) == ["a.txt", "b.txt", "b.txt", "c.txt"]
+        assert labels == ["2020-01-01", "2020-01-02", "2020-01-03", "2020-01-04", "2020-01-05"]
+        assert values == {"alice": [3, 3, 3, 3, 4], "bob": [0, 0, 2, 2, 2]}
+        assert totals == [3, 3, 5, 5, 6]
+
+        assert timeline([repo], "3", scheduler, sort="commits", cache_dir=None)[1:] == (
+            {"alice": [1, 1, 2], "bob": [0, 1, 1]}, [1, 2, 3])
+        blamed.clear()
+        assert timeline([repo], "3", scheduler, sort="files", include_files={"a.txt", "b.txt"},
+                        cache_dir=None)[1:] == ({"alice": [2, 2, 2], "bob": [0, 1, 1]}, [2, 3, 3])
+        assert sorted(blamed) == ["a.txt", "b.txt", "b.txt"] # filtered before blaming
+        # aggregated across repos, starting before `repo` existed
+        labels, values, totals = timeline([repo, "."], "--tags", scheduler, cache_dir=None)
+        assert labels == ["2020-01-05"]
+        assert values == {"alice": [4], "bob": [2]}
+
+
+def test_listed_commits(repo):
+    """rev-list specs sample the listed commits themselves (even off `--branch`)"""
+    subprocess.check_call(["git", "-C", repo, "checkout", "-qb", "side", "HEAD~2"])
+    git_commit(repo, {"d.txt": "seven\n"}, author="carol")
+    subprocess.check_call(["git", "-C", repo, "tag", "v0"])
+    subprocess.check_call(["git", "-C", repo, "checkout", "-q", "-"])
+    with Scheduler() as scheduler:
+        assert timeline([repo], "v0", scheduler, cache_dir=None)[1:] == ({"alice": [3], "carol": [1]}, [4])
+        assert timeline([repo], "v0 v1", scheduler, cache_dir=None)[1:] == (
+            {"alice": [4, 3], "bob": [2, 0], "carol": [0, 1]}, [6, 4])
+
+
+def test_iter_timeline():
+    """Sorting, filtering & formats"""
+    labels, values, totals = ["a", "b"], {"x": [1, 5], "y": [3, 2], "z": [0.04, 0.26]}, [4.04, 7.26]
+    assert loads(''.join(iter_timeline(labels, values, totals, backend="json"))) == {
+        "total": {"a": 4.0, "b": 7.3}, "data": [["x", 1, 5], ["y", 3, 2], ["z", 0.0, 0.3]],
+        "columns": ["Author", "a", "b"]}
+    assert ''.join(iter_timeline(labels, values, totals, backend="csv", row_nums=True, min_sort_val=2)) == (
+        "#,Author,a,b\r\n1,x,1,5\r\n2,y,3,2\r\n\r\na,b\r\n4.0,7.3")
+    md = ''.join(iter_timeline(labels, values, totals, sort="hours"))
+    assert md.startswith("Timeline of hours\n| Author")
+    assert md.splitlines()[-1].split() == ["|", "Total", "|", "4.0", "|", "7.3", "|"]
+    assert ''.join(iter_timeline(labels, values, totals, backend="svg")).startswith("<svg")
+    with raises(ValueError):
+        ''.join(iter_timeline(labels, values, totals, backend="unknown"))
+
+
+def test_main(repo, capsys):
+    """`--timeline` on the command-line"""
+    main(['-s', '--no-cache', '--timeline=3', '--format=json', repo])
+    assert loads(capsys.readouterr().out)["data"] == [["alice", 3, 3, 4], ["bob", 0, 2, 2]]
+    main(['-s', '--no-cache', '--timeline=3', '--sort=commits', '--min=2', repo])
+    assert "alice" in (out := capsys.readouterr().out) and "bob" not in out
+    # regex exclusion of (sets of) changed files
+    main(['-s', '--no-cache', '--timeline=3', '--excl=^c', '--format=json', repo])
+    assert loads(capsys.readouterr().out)["data"] == [["alice", 3, 3, 3], ["bob", 0, 2, 2]]
+    with raises(ValueError):
+        main(['-s', '--no-cache', '--timeline=3', '--loc=ins', repo])
@@ -6,6 +6,15 @@ def test_fext():
     assert (_utils.fext('foo/bar.baz') == 'baz')
     assert (_utils.fext('foo/.baz') == 'baz')
     assert (_utils.fext('foo/bar') == '')
+    assert (_utils.fext('foo.d/bar') == '')
+
+
+def test_fdir():
+    """Test truncation of file directories"""
+    assert (_utils.fdir('foo/bar/baz.py') == 'foo')
+    assert (_utils.fdir('foo/bar/baz.py', 2) == 'foo/bar')
+    assert (_utils.fdir('foo/bar/baz.py', 3) == 'foo/bar')
+    assert (_utils.fdir('baz.py') == '.')
 
 
 def test_Max():
@@ -21,6 +30,52 @@ def test_integer_stats():
     assert (_utils.int_cast_or_len('90') == 90)
 
 
+def test_FileSet():
+    """Test interned paths & lazily de-duplicated file sets"""
+    paths = _utils.PathTable()
+    assert [paths.intern(p) for p in ("a", "b", "a")] == [0, 1, 0]
+    assert len(paths) == 2 and paths.paths == ["a", "b"]
+
+    files = _utils.FileSet(paths)
+    for p in ("c", "a", "c", "b"):
+        files.add(p)
+    assert len(files) == 3
+    assert "a" in files and "d" not in files
+    assert sorted(files) == ["a", "b", "c"]
+    assert files == {"a", "b", "c"}
+    files.discard("b")
+    files.discard("d")
+    assert files == {"a", "c"}
+
+    other = _utils.FileSet(paths, ["d", "a"])
+    files.update(other) # same table
+    assert files == {"a", "c", "d"}
+    files.update(_utils.FileSet(_utils.PathTable(), ["e"])) # different table
+    files.update({"f"})
+    assert files == {"a", "c", "d", "e", "f"}
+    assert files != other
+    assert files | {"g"} == {"a", "c", "d", "e", "f", "g"}
+
+
 def test_print():
     """Test printing of unicode"""
+    from io import BytesIO, TextIOWrapper
     _utils.print_unicode("\x81")
+
+    out = TextIOWrapper(BytesIO(), encoding='ascii')
+    _utils.print_unicode(["a\u00fcb\n"] * 3 + ["\u00fc"], file=out, chunk_size=4)
+    _utils.print_unicode("\u00fc\u00fc", end='!', err='_', file=out)
+    out.flush()
+    assert out.buffer.getvalue() == b"a?b\n" * 3 + b"?\n__!"
+
+
+def test_iter_output():
+    """Test streaming subprocess output"""
+    import subprocess
+    import sys
+
+    from pytest import raises
+    assert list(_utils.iter_output([sys.executable, '-c', 'print("a\\nb")'])) == ['a\n', 'b\n']
+    assert list(_utils.iter_output([sys.executable, '-c', 'print("a\\rb\\r\\nc")'])) == ['a\rb\r\n', 'c\n']
+    with raises(subprocess.CalledProcessError):
+        list(_utils.iter_output([sys.executable, '-c', 'raise SystemExit(1)']))